@@ -0,0 +1,319 @@
+import argparse
+import json
+import multiprocessing
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+STAGES = [
+    "_extract_customer_name",
+    "_extract_products",
+    "_extract_shipping_address",
+    "_extract_delivery_date",
+    "_extract_special_instructions",
+    "_detect_priority",
+    "_extract_contact_info",
+]
+
+FIRST_NAMES = ["Jane", "Emily", "Robert", "Lisa", "James", "Alex", "Maria", "David", "Priya", "Tom"]
+LAST_NAMES = ["Doe", "Chen", "Taylor", "Wilson", "Morgan", "Garcia", "Smith", "Patel", "Brown", "Kim"]
+STREETS = ["Main Street", "Commerce Plaza", "Warehouse Row", "Sunshine Blvd", "Oak Avenue", "Harbor Road"]
+CITIES = ["Anytown, CA 90210", "Metro City, IL 60601", "Chicago, IL 60601", "Miami, FL 33139", "Austin, TX 73301"]
+MONTHS = ["March", "April", "May", "June", "July", "August", "September", "October"]
+ADJECTIVES = ["Cotton", "Wool", "Running", "Hiking", "Waterproof", "Ankle", "Denim", "Thermal", "Classic", "Slim"]
+NOUNS = ["T-Shirt", "Jeans", "Shoes", "Cap", "Socks", "Jacket", "Hoodie", "Shorts", "Gloves", "Scarf"]
+LINE_STYLES = ["item", "bullet", "numbered", "pairs", "bare", "freetext"]
+
+
+def synthetic_catalog(size: int, base_catalog: Dict, seed: int = 0) -> Dict:
+    """The real catalog padded with generated products up to `size` entries"""
+    rng = random.Random(seed)
+    products = list(base_catalog['products'][:size])
+    for n in range(len(products), size):
+        adjective, noun = rng.choice(ADJECTIVES), rng.choice(NOUNS)
+        products.append({
+            "sku": f"{noun.upper().replace('-', '')[:6]}-{n:06d}",
+            "name": f"{adjective} {noun} {n}",
+            "price": round(rng.uniform(5, 200), 2)
+        })
+    return {"products": products}
+
+
+def _product_lines(rng: random.Random, style: str, items: List) -> List[str]:
+    if style == "item":
+        return [f"ITEM {i}: {p['name']} ({p['sku']}) - Qty: {q}" for i, (p, q) in enumerate(items, 1)]
+    if style == "bullet":
+        return [f"- {q} {p['name']} ({p['sku']})" for p, q in items]
+    if style == "numbered":
+        return [f"{i}. {q} {p['name']} ({p['sku']}) - assorted" for i, (p, q) in enumerate(items, 1)]
+    if style == "pairs":
+        prefix = rng.choice(["", "- "])
+        return [f"{prefix}{q} pairs of {p['name']} ({p['sku']})" for p, q in items]
+    if style == "bare":
+        return [f"{q} {p['name']} ({p['sku']})" for p, q in items]
+    # Free text leaves the structured grammar nothing to match, forcing the NLP fallback
+    wanted = " and ".join(f"{q} {p['name']}" for p, q in items)
+    return [f"Could you send over {wanted} when you get a chance?"]
+
+
+def generate_email(rng: random.Random, products: List[Dict], style: str = None) -> str:
+    style = style or rng.choice(LINE_STYLES)
+    items = [(p, rng.randint(1, 250)) for p in rng.sample(products, k=min(len(products), rng.randint(1, 5)))]
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    sections = [
+        rng.choice(["Hi there,", "Dear Vendor,", "Hello,", "Order Request - URGENT\n\nHi,"]),
+        rng.choice(["I'd like to place an order for:", "Please process this order:", "PRODUCT LIST:"]),
+        "\n".join(_product_lines(rng, style, items)),
+        f"{rng.choice(['Please ship to:', 'Delivery Address:', 'Ship To:'])}\n"
+        f"{rng.randint(1, 999)} {rng.choice(STREETS)}\n{rng.choice(CITIES)}",
+    ]
+    if rng.random() < 0.6:
+        sections.append(f"{rng.choice(['Needed by', 'Must arrive before'])} {rng.choice(MONTHS)} {rng.randint(1, 28)}.")
+    if rng.random() < 0.3:
+        sections.append("Special Instructions:\n- Leave at front desk\n- Include packing slip")
+    if rng.random() < 0.3:
+        sections.append(rng.choice(["This is urgent, please rush.", "Please confirm ASAP."]))
+    sections.append(f"{rng.choice(['Thanks!', 'Regards,', 'Best regards,', 'Sincerely,'])}\n{name}\n"
+                    f"{name.split()[0].lower()}@example.com\n({rng.randint(200, 999)}) 555-{rng.randint(1000, 9999)}")
+    return "\n\n".join(sections)
+
+
+def generate_corpus(count: int, catalog: Dict, seed: int = 0) -> Iterator[str]:
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield generate_email(rng, catalog['products'])
+
+
+def percentiles(values: List[float]) -> Dict:
+    if not values:
+        return {}
+    ordered = sorted(values)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        "p50_ms": pick(0.50) * 1000,
+        "p95_ms": pick(0.95) * 1000,
+        "p99_ms": pick(0.99) * 1000,
+        "mean_ms": sum(ordered) / len(ordered) * 1000,
+    }
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is kilobytes on Linux and bytes on macOS; it never decreases within a process
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _time_stages(processor) -> Dict[str, List[float]]:
+    """Wrap the processor's extractor methods once so each call's duration is recorded; returns the shared timings"""
+    if (timings := getattr(processor, "_stage_timings", None)) is not None:
+        timings.clear()
+        return timings
+    timings = processor._stage_timings = defaultdict(list)
+    for stage in STAGES:
+        method = getattr(processor, stage)
+
+        def timed(*args, _method=method, _stage=stage, **kwargs):
+            start = time.perf_counter()
+            try:
+                return _method(*args, **kwargs)
+            finally:
+                timings[_stage].append(time.perf_counter() - start)
+
+        setattr(processor, stage, timed)
+    return timings
+
+
+def run_benchmark(processor, emails: List[str], batch_size: int = 64, n_process: int = 1) -> Dict:
+    timings = _time_stages(processor)
+
+    latencies = []
+    for email_text in emails:
+        calls_before = {stage: len(timings[stage]) for stage in STAGES}
+        start = time.perf_counter()
+        processor.process_email(email_text)
+        elapsed = time.perf_counter() - start
+        latencies.append(elapsed)
+        # Whatever the extractors did not account for is parsing and result assembly
+        extract_seconds = sum(sum(timings[stage][calls_before[stage]:]) for stage in STAGES)
+        timings["parse"].append(max(0.0, elapsed - extract_seconds))
+    serial_seconds = sum(latencies)
+
+    start = time.perf_counter()
+    for _ in processor.process_batch(emails, batch_size=batch_size, n_process=n_process):
+        pass
+    batch_seconds = time.perf_counter() - start
+
+    return {
+        "emails": len(emails),
+        "serial_emails_per_sec": len(emails) / serial_seconds if serial_seconds else 0.0,
+        "batch_emails_per_sec": len(emails) / batch_seconds if batch_seconds else 0.0,
+        "latency": percentiles(latencies),
+        "stages": {stage: percentiles(values) for stage, values in timings.items()},
+    }
+
+
+def measure_run(catalog_path: str, email_count: int, mode: str, batch_size: int, n_process: int,
+                seed: int) -> Dict:
+    """One catalog size and corpus size, run in a fresh process so peak RSS belongs to this run alone"""
+    from order_processor import OrderProcessor
+    with open(catalog_path, 'r') as f:
+        catalog = json.load(f)
+    start = time.perf_counter()
+    processor = OrderProcessor(catalog_path, mode=mode)
+    startup_seconds = time.perf_counter() - start
+    emails = list(generate_corpus(email_count, catalog, seed))
+    result = run_benchmark(processor, emails, batch_size, n_process)
+    result.update({
+        "catalog_size": len(catalog['products']),
+        "startup_seconds": startup_seconds,
+        "peak_rss_mb": peak_rss_mb(),
+    })
+    return result
+
+
+def time_command(command: List[str], repeats: int) -> Dict:
+    """Wall-clock time of a fresh interpreter running `command`, so imports are cold every time"""
+    seconds = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL, cwd=Path(__file__).parent)
+        seconds.append(time.perf_counter() - start)
+    seconds.sort()
+    return {"median_seconds": seconds[len(seconds) // 2], "min_seconds": seconds[0]}
+
+
+def run_startup_benchmark(catalog: Dict, mode: str, repeats: int = 5) -> Dict:
+    """Cold start of a processor built from scratch versus loaded from a snapshot"""
+    from order_processor import OrderProcessor
+    work_dir = Path(tempfile.mkdtemp())
+    try:
+        catalog_path = work_dir / "catalog.json"
+        snapshot_path = work_dir / "snapshot"
+        with open(catalog_path, 'w') as f:
+            json.dump(catalog, f)
+        OrderProcessor(str(catalog_path), mode=mode).save_snapshot(str(snapshot_path))
+        build = f"from order_processor import OrderProcessor; OrderProcessor({str(catalog_path)!r}, mode={mode!r})"
+        load = f"from order_processor import OrderProcessor; OrderProcessor.from_snapshot({str(snapshot_path)!r})"
+        return {
+            "catalog_size": len(catalog['products']),
+            "build": time_command([sys.executable, "-c", build], repeats),
+            "snapshot": time_command([sys.executable, "-c", load], repeats),
+        }
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the email-to-order extraction pipeline")
+    parser.add_argument("--catalog", default="data/product_catalog.json", help="Base product catalog")
+    parser.add_argument("--emails", type=int, nargs="+", default=[200], help="Corpus sizes to run")
+    parser.add_argument("--catalog-sizes", type=int, nargs="+", default=[6], help="Catalog sizes to run")
+    parser.add_argument("--mode", choices=["full", "tiered"], default="full")
+    parser.add_argument("--workers", type=int, default=1, help="n_process for the batch run")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="bench_output.json", help="Where to write the JSON results")
+    parser.add_argument("--write-corpus", metavar="DIR", help="Only write a generated corpus as *.txt files")
+    parser.add_argument("--startup", action="store_true",
+                        help="Only measure cold start: main.py --help, a fresh build and a snapshot load")
+    parser.add_argument("--repeats", type=int, default=5, help="Fresh interpreters per startup measurement")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    with open(args.catalog, 'r') as f:
+        base_catalog = json.load(f)
+
+    if args.write_corpus:
+        out_dir = Path(args.write_corpus)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        catalog = synthetic_catalog(max(args.catalog_sizes), base_catalog, args.seed)
+        for i, email_text in enumerate(generate_corpus(max(args.emails), catalog, args.seed)):
+            (out_dir / f"synthetic_{i:06d}.txt").write_text(email_text)
+        return
+
+    from rich.console import Console
+    from rich.table import Table
+    console = Console()
+
+    if args.startup:
+        report = {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "mode": args.mode,
+            "help": time_command([sys.executable, "main.py", "--help"], args.repeats),
+            "runs": [run_startup_benchmark(synthetic_catalog(size, base_catalog, args.seed), args.mode, args.repeats)
+                     for size in args.catalog_sizes],
+        }
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        table = Table(title=f"Cold start ({args.mode})", show_header=True, header_style="bold magenta")
+        for column in ["Catalog", "Build s", "Snapshot s", "Speedup"]:
+            table.add_column(column)
+        for run in report['runs']:
+            build, load = run['build']['median_seconds'], run['snapshot']['median_seconds']
+            table.add_row(str(run['catalog_size']), f"{build:.2f}", f"{load:.2f}", f"{build / load:.1f}x")
+        console.print(table)
+        console.print(f"main.py --help: {report['help']['median_seconds']:.2f}s")
+        console.print(f"Results written to {args.out}")
+        return
+
+    runs = []
+    for catalog_size in args.catalog_sizes:
+        catalog = synthetic_catalog(catalog_size, base_catalog, args.seed)
+        with tempfile.NamedTemporaryFile('w', suffix=".json", delete=False) as f:
+            json.dump(catalog, f)
+        try:
+            for email_count in args.emails:
+                # ru_maxrss only ever grows, so each run gets its own process to report its own peak
+                with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+                    runs.append(executor.submit(measure_run, f.name, email_count, args.mode, args.batch_size,
+                                                args.workers, args.seed).result())
+        finally:
+            Path(f.name).unlink()
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "mode": args.mode,
+        "workers": args.workers,
+        "batch_size": args.batch_size,
+        "seed": args.seed,
+        "runs": runs,
+    }
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    table = Table(title=f"Extraction benchmark ({args.mode})", show_header=True, header_style="bold magenta")
+    for column in ["Catalog", "Emails", "Serial/s", "Batch/s", "p50 ms", "p95 ms", "p99 ms", "Peak RSS MB"]:
+        table.add_column(column)
+    for run in runs:
+        table.add_row(
+            str(run['catalog_size']),
+            str(run['emails']),
+            f"{run['serial_emails_per_sec']:.1f}",
+            f"{run['batch_emails_per_sec']:.1f}",
+            f"{run['latency']['p50_ms']:.2f}",
+            f"{run['latency']['p95_ms']:.2f}",
+            f"{run['latency']['p99_ms']:.2f}",
+            f"{run['peak_rss_mb']:.0f}"
+        )
+    console.print(table)
+    console.print(f"Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
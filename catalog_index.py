@@ -0,0 +1,72 @@
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+from fuzzy_index import FuzzyIndex, edit_distance
+
+
+def normalize_key(text: str) -> str:
+    """Case- and whitespace-insensitive lookup key for SKUs, names and aliases"""
+    return " ".join(text.lower().split())
+
+
+class CatalogIndex:
+    """Normalized SKU/name/alias dictionaries built once when the catalog is loaded"""
+
+    def __init__(self, products: List[Dict]):
+        self.products = products
+        self.by_sku = {}
+        self.by_name = {}
+        self.by_alias = {}
+        self._fuzzy = None
+        for product in products:
+            self.by_sku.setdefault(normalize_key(product['sku']), product)
+            self.by_name.setdefault(normalize_key(product['name']), product)
+            for alias in product.get('aliases', []):
+                self.by_alias.setdefault(normalize_key(alias), product)
+        # Free-text windows worth a fuzzy lookup are at most this many words and share one of these words
+        self.name_words = {word for table in (self.by_name, self.by_alias) for key in table for word in key.split()}
+        self.max_name_words = max(
+            (len(key.split()) for table in (self.by_name, self.by_alias) for key in table), default=0
+        )
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    def lookup(self, text: str) -> Optional[Dict]:
+        key = normalize_key(text)
+        return self.by_sku.get(key) or self.by_name.get(key) or self.by_alias.get(key)
+
+    @property
+    def fuzzy(self) -> FuzzyIndex:
+        """Trigram index over every key, built on first use since most emails never need it"""
+        if self._fuzzy is None:
+            self._fuzzy = FuzzyIndex(
+                (key, product)
+                for table in (self.by_sku, self.by_name, self.by_alias)
+                for key, product in table.items()
+            )
+        return self._fuzzy
+
+    def fuzzy_lookup(self, text: str, min_confidence: float = 0.8) -> Optional[Tuple[Dict, float]]:
+        if not (key := normalize_key(text)):
+            return None
+        matches = self.fuzzy.search(key, min_confidence, limit=1)
+        return matches[0] if matches else None
+
+    def name_matches(self, text: str, product: Dict, min_confidence: float = 0.8) -> bool:
+        """Whether text is the product's name or one of its aliases, allowing the same typos as fuzzy_lookup"""
+        key = normalize_key(text)
+        for candidate in (product['name'], *product.get('aliases', [])):
+            candidate = normalize_key(candidate)
+            longest = max(len(key), len(candidate))
+            max_distance = int((1 - min_confidence) * longest)
+            if edit_distance(key, candidate, max_distance) <= max_distance:
+                return True
+        return False
+
+    def phrases_by_sku(self) -> Dict[str, Set[str]]:
+        """Every distinct lowercased phrase the PhraseMatcher should recognize, grouped by SKU key"""
+        phrases = defaultdict(set)
+        for table in (self.by_name, self.by_sku, self.by_alias):
+            for key, product in table.items():
+                phrases[normalize_key(product['sku'])].add(key)
+        return dict(phrases)
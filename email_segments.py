@@ -0,0 +1,149 @@
+import re
+from typing import List, Optional, Tuple
+
+SIGNOFF_PATTERN = re.compile(r'(?i)^(?:best|kind|warm)?\s*(?:regards|thanks|thank you|sincerely|cheers|best|yours truly)\b[\s,!.]*$')
+GREETING_PATTERN = re.compile(r'(?i)^(?:hi|hello|hey|dear|greetings|good (?:morning|afternoon|evening))\b')
+# Lines that start the quoted history of a reply; everything after them is old mail
+QUOTE_HEADER_PATTERN = re.compile(r'(?i)^(?:-{2,}\s*original message\s*-{2,}|_{10,}|on\b.*\bwrote:)$')
+# A forwarded message is usually the order itself, so it stays part of the body
+FORWARD_HEADER_PATTERN = re.compile(r'(?i)^(?:-{2,}\s*forwarded message\s*-{2,}|begin forwarded message:)$')
+FORWARD_SUBJECT_PATTERN = re.compile(r'(?i)^subject:\s*(?:fw|fwd):')
+OUTLOOK_HEADER_PATTERN = re.compile(r'(?i)^from:\s*\S')
+OUTLOOK_FIELD_PATTERN = re.compile(r'(?i)^(?:sent|date|to|subject):')
+QUOTE_PREFIX_PATTERN = re.compile(r'^(?:\s*>)+ ?')
+SIGNATURE_DELIMITERS = {"--", "-- "}
+# Lines that are order content rather than a signature: list items, "Please send:"-style
+# headings, product SKUs and quantities, and shipping address triggers
+ORDER_CONTENT_PATTERN = re.compile(
+    r'(?i)^(?:[-*\u2022]\s|\d+[.)]\s|item\s+\d)|:$|\([a-z][\w-]*\d[\w-]*\)|\b(?:qty|quantity)\b'
+    r'|\b(?:ship|deliver|mail|send)\s+to\b'
+)
+MAX_SIGNATURE_LINE_LENGTH = 72
+# How far from the end of the new message a sign-off may sit and still start the signature
+MAX_SIGNATURE_LINES = 12
+SIGNOFF_REGION_LINES = 4
+FALLBACK_SIGNOFF_LINES = 3
+
+
+class EmailSegments:
+    """An email split into new body, signature block and quoted history.
+
+    `text` is the new body followed by the signature, with quoted lines removed; the
+    greeting and sign-off regions are (start, end) character offsets into it.
+    """
+
+    def __init__(self, text: str, body_end: int, quoted: str,
+                 greeting: Optional[Tuple[int, int]], signoff: Optional[Tuple[int, int]]):
+        self.text = text
+        self.body_end = body_end
+        self.quoted = quoted
+        self.greeting = greeting
+        self.signoff = signoff
+
+    @property
+    def body(self) -> str:
+        return self.text[:self.body_end]
+
+    @property
+    def signature(self) -> str:
+        return self.text[self.body_end:]
+
+
+def _quote_header(lines, i: int) -> Optional[str]:
+    """"reply" or "forward" if line i introduces an earlier message, else None"""
+    line = lines[i].strip()
+    if FORWARD_HEADER_PATTERN.match(line):
+        return "forward"
+    following = [next_line.strip() for next_line in lines[i + 1:i + 6]]
+    # Outlook-style "From: / Sent: / To:" block introducing a quoted message
+    is_outlook = OUTLOOK_HEADER_PATTERN.match(line) and any(
+        OUTLOOK_FIELD_PATTERN.match(next_line) for next_line in following[:3]
+    )
+    if not (is_outlook or QUOTE_HEADER_PATTERN.match(line)):
+        return None
+    # Outlook uses the same header block for forwards, told apart only by the subject
+    if any(FORWARD_SUBJECT_PATTERN.match(next_line) for next_line in [line] + following):
+        return "forward"
+    return "reply"
+
+
+def _header_block_end(lines, start: int) -> int:
+    """Index just past a forward's From:/Date:/Subject: block, which may follow a blank line"""
+    i = start
+    while i < len(lines) and not lines[i].strip():
+        i += 1
+    while i < len(lines) and lines[i].strip():
+        i += 1
+    return i
+
+
+def _is_signature(lines: List[str]) -> bool:
+    """Whether the lines after a sign-off look like a signature rather than more of the order"""
+    return all(
+        len(line) <= MAX_SIGNATURE_LINE_LENGTH and not ORDER_CONTENT_PATTERN.search(line)
+        for line in (line.strip() for line in lines) if line
+    )
+
+
+def segment_email(email_text: str, keep_quoted: bool = False) -> EmailSegments:
+    """Split an email into new body, signature and quoted history.
+
+    Forwarded messages stay in the body. With `keep_quoted` the reply history is kept
+    too, with its ">" markers removed, for emails whose new part holds no order.
+    """
+    lines = email_text.replace('\r\n', '\n').split('\n')
+    new_lines = []
+    quoted_lines = []
+    forward_header_end = 0
+    for i, line in enumerate(lines):
+        if keep_quoted:
+            new_lines.append(QUOTE_PREFIX_PATTERN.sub('', line))
+            continue
+        # Header lines of a forward are kept as they are, not read as the start of a reply
+        if i >= forward_header_end and any(kept.strip() for kept in new_lines) and (kind := _quote_header(lines, i)):
+            if kind == "reply":
+                quoted_lines.extend(lines[i:])
+                break
+            forward_header_end = _header_block_end(lines, i + 1)
+        if line.lstrip().startswith('>'):
+            quoted_lines.append(line)
+        else:
+            new_lines.append(line)
+    while new_lines and not new_lines[-1].strip():
+        new_lines.pop()
+
+    offsets = []
+    offset = 0
+    for line in new_lines:
+        offsets.append(offset)
+        offset += len(line) + 1
+    text = '\n'.join(new_lines)
+    content = [i for i, line in enumerate(new_lines) if line.strip()]
+
+    signature_start = None
+    for i in reversed(content[-MAX_SIGNATURE_LINES:]):
+        if new_lines[i] in SIGNATURE_DELIMITERS:
+            signature_start = i
+            break
+        if SIGNOFF_PATTERN.match(new_lines[i].strip()):
+            # A mid-body "Thanks!" followed by the order is not where the signature starts,
+            # and neither is any earlier sign-off, since it is followed by the same lines
+            if _is_signature(new_lines[i + 1:]):
+                signature_start = i
+            break
+
+    greeting = None
+    for i in content[:3]:
+        if GREETING_PATTERN.match(new_lines[i].strip()):
+            greeting = (offsets[i], offsets[i] + len(new_lines[i]))
+            break
+
+    if signature_start is not None:
+        body_end = offsets[signature_start]
+        region = [i for i in content if i >= signature_start][:SIGNOFF_REGION_LINES]
+    else:
+        body_end = len(text)
+        region = content[-FALLBACK_SIGNOFF_LINES:]
+    signoff = (offsets[region[0]], offsets[region[-1]] + len(new_lines[region[-1]])) if region else None
+
+    return EmailSegments(text, body_end, '\n'.join(quoted_lines), greeting, signoff)
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, Optional
+
+# Bump whenever extraction logic changes, so cached results from older code are never served
+EXTRACTOR_VERSION = "5"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    day TEXT,
+    result TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_day ON results (day);
+"""
+
+
+def normalize_email(text: str) -> str:
+    """Drop transport noise (line endings, trailing whitespace) that resends and forwards add"""
+    lines = text.replace('\r\n', '\n').replace('\r', '\n').strip().split('\n')
+    return '\n'.join(line.rstrip() for line in lines)
+
+
+def depends_on_today(result: Dict) -> bool:
+    """Whether the result resolved a date against today, e.g. "next Friday" or a date without a year"""
+    return result.get('tiers', {}).get('delivery_date') == "relative"
+
+
+def catalog_fingerprint(catalog: Dict, *settings) -> str:
+    """Identify the catalog contents and processor settings a cached result depends on"""
+    digest = hashlib.sha256(EXTRACTOR_VERSION.encode())
+    digest.update(json.dumps(catalog, sort_keys=True).encode())
+    for setting in settings:
+        digest.update(b'\0' + repr(setting).encode())
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """Content-addressed extraction results: a bounded in-memory LRU in front of optional SQLite.
+
+    Results that resolved a date against today are stored with that day and only served on
+    it; everything else survives restarts until the catalog or settings change. Dated rows
+    from earlier days are pruned on first use each day, and the oldest rows go once the disk
+    table holds max_disk_entries. Several processors may share one file; each only ever
+    deletes its own stale rows.
+    """
+
+    def __init__(self, max_entries: int = 10000, db_path: Optional[str] = None,
+                 max_disk_entries: int = 100000):
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.fingerprint = ""
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._pruned_day = None
+        self._disk_rows = 0
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            columns = {row[1]: row[3] for row in self._db.execute("PRAGMA table_info(results)")}
+            if columns and columns.get("day", 1):
+                # Files from before only some rows were dated hold keys that are never asked for again
+                self._db.execute("DROP TABLE results")
+            self._db.executescript(SCHEMA)
+            self._db.commit()
+
+    def attach(self, fingerprint: str):
+        """Bind the cache to a catalog/settings fingerprint, dropping this cache's rows for the previous one"""
+        with self._lock:
+            if fingerprint == self.fingerprint:
+                return
+            previous, self.fingerprint = self.fingerprint, fingerprint
+            self._entries.clear()
+            if self._db and previous:
+                self._db.execute("DELETE FROM results WHERE fingerprint = ?", (previous,))
+                self._db.commit()
+
+    def key(self, email_text: str) -> str:
+        digest = hashlib.sha256(self.fingerprint.encode())
+        digest.update(normalize_email(email_text).encode())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        today = date.today().isoformat()
+        with self._lock:
+            if (entry := self._entries.get(key)) is not None:
+                payload, day = entry
+                if day is None or day == today:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return json.loads(payload)
+                del self._entries[key]
+            if self._db:
+                row = self._db.execute("SELECT result, day FROM results WHERE key = ?", (key,)).fetchone()
+                if row and (row[1] is None or row[1] == today):
+                    self._remember(key, row[0], row[1])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return json.loads(row[0])
+            self.misses += 1
+            return None
+
+    def put(self, key: str, result: Dict):
+        payload = json.dumps(result)
+        today = date.today().isoformat()
+        day = today if depends_on_today(result) else None
+        with self._lock:
+            self._remember(key, payload, day)
+            if self._db:
+                if today != self._pruned_day:
+                    self._prune(today)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results (key, fingerprint, day, result) VALUES (?, ?, ?, ?)",
+                    (key, self.fingerprint, day, payload)
+                )
+                self._disk_rows += 1
+                if self._disk_rows > self.max_disk_entries:
+                    self._trim()
+                self._db.commit()
+
+    def _prune(self, today: str):
+        """Delete results dated on other days, which no lookup will serve again"""
+        self._db.execute("DELETE FROM results WHERE day IS NOT NULL AND day != ?", (today,))
+        self._pruned_day = today
+        self._disk_rows = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def _trim(self):
+        # Oldest rows first; a tenth of headroom so a full table isn't trimmed on every put
+        self._disk_rows = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        if self._disk_rows > self.max_disk_entries:
+            excess = self._disk_rows - self.max_disk_entries * 9 // 10
+            self._db.execute(
+                "DELETE FROM results WHERE rowid IN (SELECT rowid FROM results ORDER BY rowid LIMIT ?)", (excess,)
+            )
+            self._disk_rows -= excess
+
+    def _remember(self, key: str, payload: str, day: Optional[str]):
+        self._entries[key] = (payload, day)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+        }
+
+    def close(self):
+        if self._db:
+            self._db.close()
+            self._db = None
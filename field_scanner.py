@@ -0,0 +1,94 @@
+import heapq
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+def _lower(text: str) -> str:
+    """Lowercase text without shifting offsets; the rare characters that lowercase to two are kept"""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return ''.join(low if len(low := char.lower()) == 1 else char for char in text)
+
+
+class FieldHits:
+    """Hits of every rule in one text, searched only as far as an extractor reads them"""
+
+    def __init__(self, text: str, keywords: Dict[str, List[str]], patterns: Dict[str, re.Pattern]):
+        self.text = text
+        self._keywords = keywords
+        self._patterns = patterns
+        self._lowered = None
+
+    def iter(self, rule: str, end: Optional[int] = None) -> Iterator[Tuple[int, int]]:
+        """(start, end) offsets of the rule's hits in text order, within text[:end]"""
+        end = len(self.text) if end is None else end
+        keyword_hits = self._keyword_hits(self._keywords[rule], end) if rule in self._keywords else None
+        if (pattern := self._patterns.get(rule)) is None:
+            return keyword_hits or iter(())
+        pattern_hits = (match.span() for match in pattern.finditer(self.text, 0, end))
+        if keyword_hits is None:
+            return pattern_hits
+        return heapq.merge(keyword_hits, pattern_hits, key=lambda hit: hit[0])
+
+    def first(self, rule: str, end: Optional[int] = None) -> Optional[Tuple[int, int]]:
+        return next(self.iter(rule, end), None)
+
+    def to_dict(self) -> Dict[str, List[Tuple[int, int]]]:
+        """Every hit of every rule, for callers that want them all"""
+        return {rule: hits for rule in {**self._keywords, **self._patterns} if (hits := list(self.iter(rule)))}
+
+    def _keyword_hits(self, keywords: List[str], end: int) -> Iterator[Tuple[int, int]]:
+        """Every occurrence of every keyword, overlapping ones included, longest first at a position.
+
+        Each keyword is located with str.find on the lowercased text and the occurrences are
+        merged through a heap, so finding the next hit costs one find per keyword involved.
+        """
+        if self._lowered is None:
+            self._lowered = _lower(self.text)
+        lowered = self._lowered
+        heap = [(start, -len(keyword), keyword) for keyword in keywords
+                if (start := lowered.find(keyword, 0, end)) >= 0]
+        heapq.heapify(heap)
+        while heap:
+            start, negative_length, keyword = heap[0]
+            yield start, start - negative_length
+            if (start := lowered.find(keyword, start + 1, end)) >= 0:
+                heapq.heapreplace(heap, (start, negative_length, keyword))
+            else:
+                heapq.heappop(heap)
+
+
+class FieldScanner:
+    """Trigger keywords and patterns for every field, searched lazily per rule.
+
+    Most extractors only need a rule's first usable hit, so nothing is searched up front:
+    keywords are found case-insensitively with str.find on the lowercased text, overlapping
+    ones included ("deliver by" and "by"), and pattern rules get their own regex. Rules are
+    searched independently, so a keyword starting where an email address does cannot hide it.
+    """
+
+    def __init__(self):
+        self._keywords = {}
+        self._patterns = {}
+        self._compiled = None
+
+    def add_keywords(self, rule: str, keywords: Iterable[str]):
+        self._keywords.setdefault(rule, []).extend(keyword.lower() for keyword in keywords if keyword)
+        self._compiled = None
+
+    def add_pattern(self, rule: str, pattern: str, ignore_case: bool = True):
+        """Add a regex rule; patterns that already spell out both cases run faster without ignore_case"""
+        self._patterns.setdefault(rule, []).append(f'(?i:{pattern})' if ignore_case else f'(?:{pattern})')
+        self._compiled = None
+
+    def _compile(self):
+        self._compiled = (
+            {rule: sorted(set(keywords)) for rule, keywords in self._keywords.items() if keywords},
+            {rule: re.compile('|'.join(patterns)) for rule, patterns in self._patterns.items()},
+        )
+
+    def scan(self, text: str) -> FieldHits:
+        if self._compiled is None:
+            self._compile()
+        return FieldHits(text, *self._compiled)
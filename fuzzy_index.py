@@ -0,0 +1,72 @@
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """Levenshtein distance, giving up with max_distance + 1 once it is certainly exceeded"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+
+def ngrams(text: str, n: int = 3) -> List[str]:
+    padded = f"${text}$"
+    return [padded[i:i + n] for i in range(max(1, len(padded) - n + 1))]
+
+
+class FuzzyIndex:
+    """Character trigram inverted lists over normalized keys, verified by edit distance.
+
+    A query only walks the posting lists of its rarest trigrams, up to a fixed budget,
+    so lookup cost is bounded no matter how large the catalog grows.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, Dict]], n: int = 3,
+                 posting_budget: int = 5000, max_candidates: int = 20):
+        self.n = n
+        self.posting_budget = posting_budget
+        self.max_candidates = max_candidates
+        self.keys = []
+        self.products = []
+        self.postings = defaultdict(list)
+        for key, product in entries:
+            entry_id = len(self.keys)
+            self.keys.append(key)
+            self.products.append(product)
+            for gram in set(ngrams(key, n)):
+                self.postings[gram].append(entry_id)
+
+    def search(self, key: str, min_confidence: float = 0.8, limit: int = 3) -> List[Tuple[Dict, float]]:
+        """Best (product, confidence) candidates, where confidence is 1 - distance / length"""
+        grams = sorted(set(ngrams(key, self.n)), key=lambda gram: len(self.postings.get(gram, ())))
+        overlap = Counter()
+        walked = 0
+        for i, gram in enumerate(grams):
+            posting = self.postings.get(gram, ())
+            # Always use the two rarest trigrams; common ones only while within budget
+            if i >= 2 and walked + len(posting) > self.posting_budget:
+                break
+            overlap.update(posting)
+            walked += len(posting)
+
+        results = {}
+        for entry_id, _ in overlap.most_common(self.max_candidates):
+            candidate = self.keys[entry_id]
+            longest = max(len(key), len(candidate))
+            max_distance = int((1 - min_confidence) * longest)
+            distance = edit_distance(key, candidate, max_distance)
+            if distance > max_distance:
+                continue
+            confidence = 1 - distance / longest
+            product = self.products[entry_id]
+            if confidence > results.get(product['sku'], (None, -1.0))[1]:
+                results[product['sku']] = (product, confidence)
+        return sorted(results.values(), key=lambda result: result[1], reverse=True)[:limit]
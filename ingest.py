@@ -0,0 +1,147 @@
+import io
+import mmap
+import os
+import re
+import zipfile
+from email import policy
+from email.parser import BytesParser
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Iterator, Tuple, Union
+
+EMAIL_SUFFIXES = {".txt", ".eml", ".mbox"}
+MBOX_SEPARATOR = b"\nFrom "
+_ESCAPED_FROM = re.compile(rb'(?m)^>(>*From )')
+_BLOCK_TAGS = {"br", "p", "div", "li", "tr", "h1", "h2", "h3", "h4", "table"}
+
+_parser = BytesParser(policy=policy.default)
+
+
+class _TextExtractor(HTMLParser):
+    """Collects visible text from an HTML body, keeping block elements on separate lines"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("script", "style"):
+            self._skip += 1
+        elif tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style"):
+            self._skip = max(0, self._skip - 1)
+        elif tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.parts.append(data)
+
+
+def html_to_text(html: str) -> str:
+    extractor = _TextExtractor()
+    extractor.feed(html)
+    extractor.close()
+    lines = (" ".join(line.split()) for line in "".join(extractor.parts).split("\n"))
+    return re.sub(r'\n{3,}', '\n\n', "\n".join(lines)).strip()
+
+
+def message_text(raw: bytes) -> str:
+    """Body text of one RFC 822 message: text/plain, else stripped text/html.
+
+    Attachment payloads stay as raw bytes inside the parsed message and are never decoded.
+    """
+    message = _parser.parsebytes(raw)
+    body = message.get_body(preferencelist=("plain", "html"))
+    if body is None:
+        return ""
+    try:
+        content = body.get_content()
+    except (LookupError, UnicodeDecodeError):
+        content = (body.get_payload(decode=True) or b"").decode("utf-8", errors="replace")
+    if body.get_content_subtype() == "html":
+        return html_to_text(content)
+    return content.strip()
+
+
+def iter_mbox(path: Union[str, Path]) -> Iterator[Tuple[str, str]]:
+    """Yield messages from an mbox file through a memory map, one message in memory at a time"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            yield from iter_mbox_buffer(buffer, str(path))
+
+
+def iter_mbox_buffer(buffer, source: str) -> Iterator[Tuple[str, str]]:
+    """Split an mbox held in any buffer with find() (mmap or bytes) into message texts"""
+    start = 0 if buffer[:5] == b"From " else buffer.find(MBOX_SEPARATOR)
+    index = 0
+    while start != -1:
+        if buffer[start:start + 1] == b"\n":
+            start += 1
+        end = buffer.find(MBOX_SEPARATOR, start)
+        raw = buffer[start:end if end != -1 else len(buffer)]
+        # Drop the "From " envelope line and undo mboxrd escaping of body lines
+        raw = _ESCAPED_FROM.sub(rb'\1', raw[raw.find(b"\n") + 1:])
+        yield f"{source}:{index}", message_text(raw)
+        index += 1
+        start = end
+
+
+def iter_maildir(path: Union[str, Path]) -> Iterator[Tuple[str, str]]:
+    for subdir in ("new", "cur"):
+        folder = Path(path) / subdir
+        if not folder.is_dir():
+            continue
+        for name in sorted(entry.name for entry in os.scandir(folder) if entry.is_file()):
+            yield str(folder / name), message_text((folder / name).read_bytes())
+
+
+def iter_emails(path: Union[str, Path]) -> Iterator[Tuple[str, str]]:
+    """Lazily yield (source, body text) from a directory, Maildir, mbox, .eml or .txt file"""
+    path = Path(path)
+    if path.is_dir():
+        if (path / "cur").is_dir() or (path / "new").is_dir():
+            yield from iter_maildir(path)
+            return
+        for child in sorted(path.iterdir()):
+            if child.is_file() and child.suffix.lower() in EMAIL_SUFFIXES:
+                yield from iter_emails(child)
+    elif path.suffix.lower() == ".eml":
+        yield str(path), message_text(path.read_bytes())
+    elif path.suffix.lower() == ".mbox" or _starts_with(path, b"From "):
+        yield from iter_mbox(path)
+    else:
+        with open(path, 'r') as f:
+            yield str(path), f.read()
+
+
+def iter_upload(name: str, data: bytes) -> Iterator[Tuple[str, str]]:
+    """Like iter_emails for in-memory file contents, such as browser uploads; also opens .zip archives"""
+    suffix = Path(name).suffix.lower()
+    if suffix == ".zip":
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            for member in archive.infolist():
+                member_path = Path(member.filename)
+                if member.is_dir() or member_path.suffix.lower() not in EMAIL_SUFFIXES | {".zip"}:
+                    continue
+                # Finder adds resource-fork twins ("__MACOSX/._order.eml") that are not emails
+                if "__MACOSX" in member_path.parts or member_path.name.startswith("._"):
+                    continue
+                yield from iter_upload(f"{name}/{member.filename}", archive.read(member))
+    elif suffix == ".eml":
+        yield name, message_text(data)
+    elif suffix == ".mbox" or data[:5] == b"From ":
+        yield from iter_mbox_buffer(data, name)
+    else:
+        yield name, data.decode("utf-8", errors="replace")
+
+
+def _starts_with(path: Path, prefix: bytes) -> bool:
+    with open(path, 'rb') as f:
+        return f.read(len(prefix)) == prefix
@@ -0,0 +1,84 @@
+import re
+from typing import List, NamedTuple, Optional, Tuple
+
+# Product line formats in priority order. Each pattern may capture `qty`, `name`
+# and `sku`; a format without `sku` is a standalone quantity for the previous product.
+PRODUCT_LINE_FORMATS = [
+    # ITEM X: Product (SKU) - Qty: N
+    ("item", r'ITEM\s+\d+:\s*(?P<name>.+?)\s*\((?P<sku>[^)]+)\)\s*(?:-\s*Qty:\s*(?P<qty>\d+))?'),
+    # N pairs of Product (SKU), optionally as a bullet point
+    ("pairs", r'(?:-\s*)?(?P<qty>\d+)\s+pairs?\s+of\s+(?P<name>.+?)\s*\((?P<sku>[^)]+)\)'),
+    # - N Product (SKU)
+    ("bullet", r'-\s*(?P<qty>\d+)\s+(?P<name>.+?)\s*\((?P<sku>[^)]+)\)'),
+    # 1. N Product (SKU)
+    ("numbered", r'\d+\.\s*(?P<qty>\d+)\s*(?:x|\*)?\s*(?P<name>.+?)\s*\((?P<sku>[^)]+)\)'),
+    # N Product (SKU)
+    ("bare", r'(?P<qty>\d+)\s+(?P<name>.+?)\s*\((?P<sku>[^)]+)\)'),
+    # Qty: N
+    ("qty", r'.*?(?:qty|quantity)\s*:\s*(?P<qty>\d+)'),
+]
+
+_FIELDS = ("qty", "name", "sku")
+_GROUP_NAME = re.compile(r'\(\?P<(\w+)>')
+_HAS_DIGIT = re.compile(r'\d')
+
+
+class LineMatch(NamedTuple):
+    kind: str
+    qty: Optional[str]
+    name: Optional[str]
+    sku: Optional[str]
+    name_span: Optional[Tuple[int, int]]
+
+
+class LineGrammar:
+    """All product line formats compiled into one alternation and classified in a single match"""
+
+    def __init__(self, formats: List[Tuple[str, str]] = PRODUCT_LINE_FORMATS):
+        self.formats = []
+        self._pattern = None
+        self._groups = {}
+        for kind, pattern in formats:
+            self.register(kind, pattern)
+
+    def register(self, kind: str, pattern: str, before: Optional[str] = None):
+        """Add a line format; it is tried after existing formats unless `before` names one"""
+        if any(existing == kind for existing, _ in self.formats):
+            raise ValueError(f"Line format '{kind}' is already registered")
+        position = len(self.formats)
+        if before is not None:
+            position = [existing for existing, _ in self.formats].index(before)
+        self.formats.insert(position, (kind, pattern))
+        self._compile()
+
+    def _compile(self):
+        alternatives = []
+        for kind, pattern in self.formats:
+            # Group names must be unique across the alternation, so scope them by format
+            scoped = _GROUP_NAME.sub(lambda m: f'(?P<{kind}__{m.group(1)}>', pattern)
+            alternatives.append(f'(?P<{kind}>{scoped})')
+        self._pattern = re.compile(r'\s*(?:' + '|'.join(alternatives) + ')', re.IGNORECASE)
+        self._groups = {
+            kind: tuple(
+                f"{kind}__{field}" if f"{kind}__{field}" in self._pattern.groupindex else None
+                for field in _FIELDS
+            )
+            for kind, _ in self.formats
+        }
+
+    def classify(self, line: str) -> Optional[LineMatch]:
+        # Every format needs at least a quantity or item number
+        if not _HAS_DIGIT.search(line):
+            return None
+        if not (match := self._pattern.match(line)):
+            return None
+        kind = match.lastgroup
+        qty_group, name_group, sku_group = self._groups[kind]
+        name = match.group(name_group) if name_group else None
+        return LineMatch(
+            kind,
+            match.group(qty_group) if qty_group else None,
+            name,
+            match.group(sku_group) if sku_group else None,
+            match.span(name_group) if name is not None else None
+        )
@@ -1,28 +1,137 @@
+import argparse
 import json
+from collections import deque
+from functools import lru_cache
 from pathlib import Path
-from rich.console import Console
-from rich.table import Table
-from rich.panel import Panel
-from order_processor import OrderProcessor
 
-console = Console()
+# rich, spaCy and the processor are imported where they are used, so --help stays instant
+
+@lru_cache(maxsize=None)
+def get_console():
+    from rich.console import Console
+    return Console()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Extract structured orders from email files")
+    parser.add_argument("--input", "--emails-dir", dest="input", default="data/sample_emails",
+                        help="Directory of .txt/.eml/.mbox files, a Maildir, an mbox or a single email file")
+    parser.add_argument("--workers", type=int, default=1, help="Number of spaCy worker processes")
+    parser.add_argument("--batch-size", type=int, default=64, help="Emails per nlp.pipe batch")
+    parser.add_argument("--mode", choices=["full", "tiered"], default="full",
+                        help="tiered runs regex extraction first and spaCy components only when needed")
+    parser.add_argument("--cache-size", type=int, default=0, help="In-memory result cache entries (0 disables)")
+    parser.add_argument("--cache-db", help="SQLite file that persists cached results across runs")
+    parser.add_argument("--profile", action="store_true", help="Print per-stage timings after processing")
+    parser.add_argument("--slow-threshold", type=float, default=1.0, help="Seconds before an email is logged as slow")
+    parser.add_argument("--output", help="Write orders to .jsonl, .csv or .parquet instead of printing them")
+    parser.add_argument("--snapshot", help="Load the processor from this snapshot directory, creating it on first use")
+    parser.add_argument("--rules", help="JSON file of review rules, e.g. {\"max_quantity\": 500}")
+    return parser.parse_args()
+
+def load_processor(args, cache, metrics):
+    from order_processor import OrderProcessor
+    from order_validation import ValidationRules
+    rules = ValidationRules.load(args.rules) if args.rules else None
+    if not args.snapshot:
+        return OrderProcessor(mode=args.mode, cache=cache, metrics=metrics, rules=rules)
+    console = get_console()
+    if (Path(args.snapshot) / "settings.json").exists():
+        try:
+            processor = OrderProcessor.from_snapshot(args.snapshot, cache=cache, metrics=metrics)
+        except ValueError as e:
+            console.print(f"Rebuilding snapshot: {e}", style="yellow")
+        else:
+            if processor.mode != args.mode:
+                console.print(f"Snapshot was taken in {processor.mode} mode; ignoring --mode {args.mode}", style="yellow")
+            if rules is not None:
+                processor.set_rules(rules)
+            return processor
+    processor = OrderProcessor(mode=args.mode, cache=cache, metrics=metrics, rules=rules)
+    processor.save_snapshot(args.snapshot)
+    return processor
 
 def main():
+    args = parse_args()
+    from rich.panel import Panel
+    from extraction_cache import ExtractionCache
+    from ingest import iter_emails
+    from metrics import ProcessorMetrics
+    console = get_console()
     console.print(Panel.fit("📧 Email-to-Order Automation System", style="bold blue"))
     
-    processor = OrderProcessor()
+    cache = None
+    if args.cache_size or args.cache_db:
+        cache = ExtractionCache(max_entries=args.cache_size or 10000, db_path=args.cache_db)
+    metrics = ProcessorMetrics(slow_threshold=args.slow_threshold) if args.profile else None
+    processor = load_processor(args, cache, metrics)
+    
+    # Sources are recorded as texts are pulled, so archives are never held in memory
+    sources = deque()
     
-    sample_emails_dir = Path("data/sample_emails")
-    for email_file in sample_emails_dir.glob("*.txt"):
-        console.print(f"\n📨 Processing {email_file.name}", style="bold")
-        
-        with open(email_file, 'r') as f:
-            email_content = f.read()
-        
-        order_data = processor.process_email(email_content)
+    def email_texts():
+        for source, email_content in iter_emails(args.input):
+            sources.append(source)
+            yield email_content
+    
+    writer = None
+    if args.output:
+        from order_records import BatchWriter
+        writer = BatchWriter(args.output)
+    
+    results = processor.process_batch(email_texts(), batch_size=args.batch_size, n_process=args.workers)
+    for order_data in results:
+        source = sources.popleft()
+        if writer is not None:
+            writer.write(order_data, source)
+            continue
+        console.print(f"\n📨 Processing {source}", style="bold")
         display_results(order_data)
+    
+    if writer is not None:
+        writer.close()
+        console.print(f"💾 Wrote {writer.orders} orders and {writer.items} line items to "
+                      f"{', '.join(str(output) for output in writer.outputs)}")
+    
+    if cache is not None:
+        stats = cache.stats()
+        console.print(f"\n🗃️ Cache: {stats['hits']} hits ({stats['disk_hits']} from disk), "
+                      f"{stats['misses']} misses, {stats['hit_rate']:.0%} hit rate")
+    
+    if metrics is not None:
+        display_profile(metrics.snapshot())
+
+def display_profile(snapshot: dict):
+    from rich.table import Table
+    console = get_console()
+    profile_table = Table(title="Stage Profile", show_header=True, header_style="bold magenta")
+    profile_table.add_column("Stage")
+    profile_table.add_column("Calls")
+    profile_table.add_column("Total ms")
+    profile_table.add_column("Mean ms")
+    profile_table.add_column("p95 ms")
+    profile_table.add_column("Max ms")
+    
+    stages = sorted(snapshot['stages'].items(), key=lambda item: item[1]['sum'], reverse=True)
+    for stage, stats in stages + [("email (end to end)", snapshot['email_seconds'])]:
+        profile_table.add_row(
+            stage,
+            str(stats['count']),
+            f"{stats['sum'] * 1000:.1f}",
+            f"{stats['sum'] / stats['count'] * 1000 if stats['count'] else 0:.2f}",
+            f"{stats['p95'] * 1000:.2f}",
+            f"{stats['max'] * 1000:.2f}"
+        )
+    
+    console.print(profile_table)
+    counters = ", ".join(f"{event}={value}" for event, value in sorted(snapshot['counters'].items()))
+    console.print(f"Events: {counters or 'none'}")
+    for entry in snapshot['slow_emails']:
+        console.print(f"🐢 {entry['seconds']:.3f}s: {entry['preview']!r}", style="yellow")
 
 def display_results(order_data: dict):
+    from rich.panel import Panel
+    from rich.table import Table
+    console = get_console()
     customer_table = Table(title="Customer Information", show_header=True, header_style="bold magenta")
     customer_table.add_column("Field")
     customer_table.add_column("Value")
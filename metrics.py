@@ -0,0 +1,201 @@
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Sequence
+
+# Stage label for every OrderProcessor method that gets timed
+STAGE_METHODS = {
+    "_parse": "parse",
+    "_extract_customer_name": "customer_name",
+    "_extract_products": "products",
+    "_extract_shipping_address": "shipping_address",
+    "_extract_delivery_date": "delivery_date",
+    "_extract_special_instructions": "special_instructions",
+    "_detect_priority": "priority",
+    "_extract_contact_info": "contact",
+}
+SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10)
+
+slow_logger = logging.getLogger("order_processor.slow")
+
+
+class Histogram:
+    """Fixed-bucket histogram in the Prometheus style"""
+
+    def __init__(self, buckets: Sequence[float] = SECONDS_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by interpolating inside the bucket that contains it"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for bound, bucket_count in zip(self.buckets + (self.max,), self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                return min(self.max, lower + (bound - lower) * (rank - seen) / bucket_count)
+            seen += bucket_count
+            lower = bound
+        return self.max
+
+    def snapshot(self) -> Dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+class ProcessorMetrics:
+    """Per-stage timings, event counters and a slow-email log for an instrumented OrderProcessor"""
+
+    def __init__(self, slow_threshold: float = 1.0, slow_log_size: int = 100):
+        self.slow_threshold = slow_threshold
+        self.stages = defaultdict(Histogram)
+        self.email_seconds = Histogram()
+        self.nlp_calls_per_email = Histogram(COUNT_BUCKETS)
+        self.counters = defaultdict(int)
+        self.slow_emails = deque(maxlen=slow_log_size)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _trace(self) -> Dict:
+        if not hasattr(self._local, "trace"):
+            self._local.trace = {"stages": {}, "nlp_calls": 0}
+        return self._local.trace
+
+    def instrument(self, processor):
+        """Wrap the processor's stage methods; an uninstrumented processor pays nothing"""
+        for method_name, stage in STAGE_METHODS.items():
+            setattr(processor, method_name, self._timed(stage, getattr(processor, method_name)))
+        build_order = processor._build_order
+
+        def timed_build_order(segments, doc):
+            start = time.perf_counter()
+            try:
+                return build_order(segments, doc)
+            finally:
+                self._finish_email(doc.text, time.perf_counter() - start)
+
+        processor._build_order = timed_build_order
+
+    def _timed(self, stage: str, method):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self._record_stage(stage, time.perf_counter() - start)
+
+        return timed
+
+    def timed_iter(self, stage: str, items: Iterable) -> Iterator:
+        """Time how long each item of a lazy iterator (e.g. nlp.pipe) takes to arrive"""
+        iterator = iter(items)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self._record_stage(stage, time.perf_counter() - start)
+            yield item
+
+    def _record_stage(self, stage: str, seconds: float):
+        trace = self._trace()
+        trace["stages"][stage] = trace["stages"].get(stage, 0.0) + seconds
+        if stage == "parse":
+            trace["nlp_calls"] += 1
+        with self._lock:
+            self.stages[stage].observe(seconds)
+
+    def incr(self, event: str, amount: int = 1):
+        if event.startswith("nlp:"):
+            self._trace()["nlp_calls"] += amount
+        with self._lock:
+            self.counters[event] += amount
+
+    def _finish_email(self, email_text: str, extract_seconds: float):
+        trace = self._trace()
+        self._local.trace = {"stages": {}, "nlp_calls": 0}
+        seconds = extract_seconds + trace["stages"].get("parse", 0.0)
+        with self._lock:
+            self.email_seconds.observe(seconds)
+            self.nlp_calls_per_email.observe(trace["nlp_calls"])
+            self.counters["emails"] += 1
+            if seconds < self.slow_threshold:
+                return
+            self.counters["slow_emails"] += 1
+            entry = {
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
+                "seconds": seconds,
+                "chars": len(email_text),
+                "preview": email_text[:80],
+                "stages": trace["stages"],
+            }
+            self.slow_emails.append(entry)
+        slowest = max(trace["stages"].items(), key=lambda item: item[1], default=("none", 0.0))
+        slow_logger.warning("Slow email: %.3fs over %d chars, slowest stage %s (%.3fs)",
+                            seconds, len(email_text), slowest[0], slowest[1])
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "stages": {stage: histogram.snapshot() for stage, histogram in self.stages.items()},
+                "email_seconds": self.email_seconds.snapshot(),
+                "nlp_calls_per_email": self.nlp_calls_per_email.snapshot(),
+                "counters": dict(self.counters),
+                "slow_emails": list(self.slow_emails),
+            }
+
+    def to_prometheus(self, prefix: str = "order_processor") -> str:
+        lines = []
+        with self._lock:
+            lines += histogram_lines(f"{prefix}_stage_seconds", "Time spent per extraction stage",
+                                     {f'stage="{stage}"': h for stage, h in self.stages.items()})
+            lines += histogram_lines(f"{prefix}_email_seconds", "End-to-end extraction time per email",
+                                     {"": self.email_seconds})
+            lines += histogram_lines(f"{prefix}_nlp_calls_per_email", "spaCy pipeline invocations per email",
+                                     {"": self.nlp_calls_per_email})
+            lines.append(f"# HELP {prefix}_events_total Extraction events such as fallbacks and NLP runs")
+            lines.append(f"# TYPE {prefix}_events_total counter")
+            for event, value in sorted(self.counters.items()):
+                lines.append(f'{prefix}_events_total{{event="{event}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+def histogram_lines(name: str, help_text: str, series: Dict[str, Histogram]) -> List[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for labels, histogram in series.items():
+        prefix = f"{labels}," if labels else ""
+        cumulative = 0
+        for bound, bucket_count in zip(histogram.buckets, histogram.counts):
+            cumulative += bucket_count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {histogram.count}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {histogram.sum}")
+        lines.append(f"{name}_count{suffix} {histogram.count}")
+    return lines
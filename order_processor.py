@@ -1,147 +1,644 @@
 import json
+import logging
+import os
+import pickle
 import re
+import threading
+import zlib
+from collections import defaultdict, deque
 from datetime import datetime
 from dateutil import parser
-import spacy
-from typing import Dict, List, Optional
-from spacy.matcher import PhraseMatcher
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from datetime import timedelta
+from catalog_index import CatalogIndex
+from line_grammar import LineGrammar, LineMatch
+from extraction_cache import EXTRACTOR_VERSION, ExtractionCache, catalog_fingerprint
+from metrics import ProcessorMetrics
+from order_validation import ValidationRules, review_reasons
+from email_segments import EmailSegments, segment_email
+from field_scanner import FieldScanner
+
+# "full" runs the whole spaCy pipeline on every email; "tiered" tokenizes only and
+# runs NER or the parser lazily when the regex tier leaves a field missing or unsure
+MODES = ("full", "tiered")
+# Components no extractor reads, so tiered mode never loads them
+UNUSED_PIPES = ["tagger", "attribute_ruler", "lemmatizer", "senter"]
+# Bumped whenever the layout written by save_snapshot changes
+SNAPSHOT_FORMAT = 1
+# Product patterns are spread over this many matcher keys; see _matcher_shards
+MATCHER_SHARDS = 1024
+# Shorter free-text windows are too easily one typo away from an unrelated word
+FUZZY_BODY_MIN_CHARS = 8
+
+NAME_LINE_PATTERN = re.compile(r"^([A-Z][a-zA-Z'-]+(?:\s+[A-Z][a-zA-Z'-]+){0,2}),?$")
+
+# Field triggers found by the FieldScanner, and what must follow each hit
+SECTION_TAIL = re.compile(r'[:\s]*(.*?)(?:\n\n|\Z)', re.DOTALL)
+INSTRUCTIONS_TAIL = re.compile(r':?(.*?)(?:\n\n|\Z)', re.DOTALL)
+DATE_VALUE = r'([A-Za-z]+\s+\d{1,2}(?:\s*,\s*\d{4})?)'
+DATE_TRIGGERS = [
+    ("date_by", ["required by", "due by", "by", "needed by", "arrive by"], re.compile(r'\s*' + DATE_VALUE)),
+    ("date_label", ["delivery date", "deliver by"], re.compile(r'\s*:\s*' + DATE_VALUE)),
+    ("date_relative", ["need these by"], re.compile(r'\s*(next\s+[A-Za-z]+|next\s+week|tomorrow)', re.IGNORECASE)),
+    ("date_before", ["must arrive before"], re.compile(r'\s*' + DATE_VALUE)),
+]
+MONTH_DAY_PATTERN = (
+    r'\bMarch\s+\d{1,2}\b|\bApr(?:il)?\s+\d{1,2}\b|\bMay\s+\d{1,2}\b|\bJun(?:e)?\s+\d{1,2}\b|'
+    r'\bJul(?:y)?\s+\d{1,2}\b|\bAug(?:ust)?\s+\d{1,2}\b|\bSep(?:tember)?\s+\d{1,2}\b|'
+    r'\bOct(?:ober)?\s+\d{1,2}\b|\bNov(?:ember)?\s+\d{1,2}\b|\bDec(?:ember)?\s+\d{1,2}\b|'
+    r'\bJan(?:uary)?\s+\d{1,2}\b|\bFeb(?:ruary)?\s+\d{1,2}\b'
+)
+EMAIL_PATTERN = r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
+PHONE_PATTERN = r'\(\d{3}\) \d{3}-\d{4}'
+YEAR_PATTERN = re.compile(r'\b\d{4}\b')
+
+logger = logging.getLogger(__name__)
+
+
+def _file_stamp(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+class EmailContext:
+    """Single parsed view of an email shared by every extractor.
+
+    The Doc covers the new message and its signature; quoted history is never parsed.
+    Order fields read `body` and `lines`, which exclude the signature block, and the
+    keyword `hits` of the whole text, searched only as far as each extractor reads them.
+    """
+
+    def __init__(self, segments: EmailSegments, doc, applied_pipes: Iterable[str] = ()):
+        self.segments = segments
+        self.text = segments.text
+        self.body = segments.body
+        self.doc = doc
+        self.applied_pipes = set(applied_pipes)
+        self.tiers = {}
+        self.hits = None
+        self.catalog_index = None
+        self.lines = []
+        offset = 0
+        for raw_line in self.body.split('\n'):
+            line = raw_line.strip()
+            self.lines.append((offset + len(raw_line) - len(raw_line.lstrip()), line))
+            offset += len(raw_line) + 1
+
+    def span(self, start: int, end: int):
+        """Slice the parsed Doc by character offsets instead of re-parsing the text"""
+        return self.doc.char_span(start, end, alignment_mode="expand")
 
 class OrderProcessor:
-    def __init__(self, catalog_path: str = "data/product_catalog.json"):
-        self.nlp = spacy.load("en_core_web_sm")
+    def __init__(self, catalog_path: str = "data/product_catalog.json", mode: str = "full",
+                 confidence_threshold: float = 0.5, cache: Optional[ExtractionCache] = None,
+                 metrics: Optional[ProcessorMetrics] = None, fuzzy_threshold: float = 0.8,
+                 rules: Optional[ValidationRules] = None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode '{mode}', expected one of {MODES}")
+        self.mode = mode
+        self.confidence_threshold = confidence_threshold
+        self.fuzzy_threshold = fuzzy_threshold
+        self.rules = rules or ValidationRules()
+        # Imported here so code paths that never build a processor don't pay for spaCy
+        import spacy
+        if mode == "tiered":
+            self.nlp = spacy.load("en_core_web_sm", exclude=UNUSED_PIPES)
+            self._lazy_pipes = list(self.nlp.pipe_names)
+        else:
+            self.nlp = spacy.load("en_core_web_sm")
+            # NER only ever runs on the greeting and sign-off regions
+            self._lazy_pipes = [name for name in self.nlp.pipe_names if name == "ner"]
+        self.catalog_path = catalog_path
         self.catalog = self._load_catalog(catalog_path)
+        self.catalog_index = CatalogIndex(self.catalog['products'])
+        self.catalog_version = 1
         self.product_matcher = self._create_product_matcher()
         self.address_keywords = ["ship to", "deliver to", "mail to", "address", "send to"]
-        self.quantity_phrases = ["quantity", "qty", "x", "of"]
         self.priority_keywords = ["urgent", "immediate", "asap", "time is critical", "rush"]
+        self._setup(cache, metrics)
+
+    def _setup(self, cache: Optional[ExtractionCache], metrics: Optional[ProcessorMetrics]):
+        """State that is cheap to rebuild, shared by __init__ and from_snapshot"""
+        self._matcher_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self.line_grammar = LineGrammar()
+        self.quantity_phrases = ["quantity", "qty", "x", "of"]
+        self.field_scanner = self._create_field_scanner()
+        self.cache = cache
+        self._update_fingerprint()
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.instrument(self)
+
+    def save_snapshot(self, path: str):
+        """Write the loaded pipeline, matcher patterns and catalog index to a directory"""
+        import spacy
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        with self._reload_lock:
+            catalog, index, phrases = self.catalog, self.catalog_index, self._matcher_phrases
+            self.nlp.to_disk(path / "nlp")
+            # PhraseMatcher accepts the LOWER hash sequences directly, so loading needs
+            # neither the tokenizer nor a lexeme for every SKU
+            patterns = {
+                key: [tuple(int(value) for value in doc.to_array("LOWER")) for doc in docs]
+                for key, docs in self._pattern_docs(phrases).items()
+            }
+            with open(path / "catalog.pkl", 'wb') as f:
+                pickle.dump((catalog, index, phrases, patterns), f, protocol=pickle.HIGHEST_PROTOCOL)
+            settings = {
+                "format": SNAPSHOT_FORMAT,
+                "extractor_version": EXTRACTOR_VERSION,
+                "spacy_version": spacy.__version__,
+                "mode": self.mode,
+                "confidence_threshold": self.confidence_threshold,
+                "fuzzy_threshold": self.fuzzy_threshold,
+                "lazy_pipes": self._lazy_pipes,
+                "address_keywords": self.address_keywords,
+                "priority_keywords": self.priority_keywords,
+                "rules": self.rules.to_dict(),
+                "catalog_path": self.catalog_path,
+                "catalog_stamp": _file_stamp(self.catalog_path),
+                "catalog_version": self.catalog_version,
+            }
+            with open(path / "settings.json", 'w') as f:
+                json.dump(settings, f, indent=2)
+
+    @classmethod
+    def from_snapshot(cls, path: str, cache: Optional[ExtractionCache] = None,
+                      metrics: Optional[ProcessorMetrics] = None) -> "OrderProcessor":
+        """Load a processor written by save_snapshot, skipping catalog parsing and pattern tokenization.
+
+        The catalog index is unpickled, so only load snapshots this deployment wrote itself.
+        If the catalog file changed since the snapshot was taken, the difference is reloaded.
+        """
+        import spacy
+        from spacy.matcher import PhraseMatcher
+        path = Path(path)
+        with open(path / "settings.json", 'r') as f:
+            settings = json.load(f)
+        stale = {
+            "format": SNAPSHOT_FORMAT,
+            "extractor_version": EXTRACTOR_VERSION,
+            "spacy_version": spacy.__version__,
+        }
+        for field, expected in stale.items():
+            if settings.get(field) != expected:
+                raise ValueError(f"Snapshot {path} has {field} {settings.get(field)!r}, expected {expected!r}")
+
+        processor = cls.__new__(cls)
+        processor.mode = settings["mode"]
+        processor.confidence_threshold = settings["confidence_threshold"]
+        processor.fuzzy_threshold = settings["fuzzy_threshold"]
+        processor.nlp = spacy.load(path / "nlp")
+        processor._lazy_pipes = settings["lazy_pipes"]
+        processor.address_keywords = settings["address_keywords"]
+        processor.priority_keywords = settings["priority_keywords"]
+        processor.rules = ValidationRules(**settings.get("rules", {}))
+        processor.catalog_path = settings["catalog_path"]
+        processor.catalog_version = settings["catalog_version"]
+        with open(path / "catalog.pkl", 'rb') as f:
+            processor.catalog, processor.catalog_index, processor._matcher_phrases, patterns = pickle.load(f)
+
+        matcher = PhraseMatcher(processor.nlp.vocab, attr="LOWER")
+        for key, keywords in patterns.items():
+            matcher.add(key, keywords)
+        processor.product_matcher = matcher
+        processor._setup(cache, metrics)
+
+        stamp = _file_stamp(processor.catalog_path)
+        if stamp is not None and list(stamp) != settings["catalog_stamp"]:
+            processor.reload_catalog()
+        return processor
+
+    def _update_fingerprint(self):
+        self.fingerprint = catalog_fingerprint(
+            self.catalog, self.mode, self.confidence_threshold, self.fuzzy_threshold,
+            self.address_keywords, self.priority_keywords, self.rules
+        )
+        if self.cache is not None:
+            self.cache.attach(self.fingerprint)
+
+    def set_keywords(self, field: str, keywords: List[str]):
+        """Replace the trigger keywords for "address" or "priority" and recompile the scanner"""
+        if field not in ("address", "priority"):
+            raise ValueError(f"No configurable keywords for '{field}'")
+        setattr(self, f"{field}_keywords", list(keywords))
+        self.field_scanner = self._create_field_scanner()
+        self._update_fingerprint()
+
+    def set_rules(self, rules: ValidationRules):
+        """Replace the review rules; cached results made under the old rules no longer match"""
+        self.rules = rules
+        self._update_fingerprint()
+
+    def _create_field_scanner(self) -> FieldScanner:
+        scanner = FieldScanner()
+        scanner.add_keywords("address", self.address_keywords)
+        for rule, keywords, _ in DATE_TRIGGERS:
+            scanner.add_keywords(rule, keywords)
+        scanner.add_pattern("date_month", MONTH_DAY_PATTERN)
+        scanner.add_keywords("next_friday", ["next friday"])
+        scanner.add_keywords("instructions", ["special instructions"])
+        scanner.add_keywords("priority", self.priority_keywords)
+        scanner.add_pattern("email", EMAIL_PATTERN, ignore_case=False)
+        scanner.add_pattern("phone", PHONE_PATTERN, ignore_case=False)
+        return scanner
 
     def _load_catalog(self, path: str) -> Dict:
         with open(path, 'r') as f:
             return json.load(f)
 
     def _create_product_matcher(self):
+        from spacy.matcher import PhraseMatcher
         matcher = PhraseMatcher(self.nlp.vocab, attr="LOWER")
-        patterns = [self.nlp(product['name'].lower()) for product in self.catalog['products']]
-        patterns += [self.nlp(product['sku'].lower()) for product in self.catalog['products']]
-        matcher.add("PRODUCT", patterns)
+        self._matcher_phrases = self._matcher_shards(self.catalog_index)
+        for key, patterns in self._pattern_docs(self._matcher_phrases).items():
+            matcher.add(key, patterns)
         return matcher
 
+    def _matcher_shards(self, index: CatalogIndex) -> Dict[str, set]:
+        """Group the catalog phrases under a fixed set of match keys hashed from the SKU.
+
+        A reload only swaps the shards whose phrases changed, and unlike a key per SKU
+        this does not add a vocab entry for every product.
+        """
+        shards = defaultdict(set)
+        for sku, phrases in index.phrases_by_sku().items():
+            shards[f"PRODUCT_{zlib.crc32(sku.encode()) % MATCHER_SHARDS}"].update(phrases)
+        return dict(shards)
+
+    def _pattern_docs(self, phrases: Dict[str, set]) -> Dict[str, List]:
+        # LOWER only needs tokens, so skip the tagger/parser/NER for every catalog entry
+        keys = [key for key, texts in phrases.items() for _ in texts]
+        docs = self.nlp.tokenizer.pipe(text for texts in phrases.values() for text in texts)
+        patterns = {}
+        for key, doc in zip(keys, docs):
+            patterns.setdefault(key, []).append(doc)
+        return patterns
+
+    def reload_catalog(self, catalog_path: Optional[str] = None) -> Dict:
+        """Diff the catalog file against the loaded one and apply only what changed.
+
+        Matcher patterns are replaced for changed SKUs only, and the lookup index is swapped
+        in one assignment, so emails already in flight finish against the catalog they started with.
+        """
+        with self._reload_lock:
+            path = catalog_path or self.catalog_path
+            catalog = self._load_catalog(path)
+            self.catalog_path = path
+            old_index = self.catalog_index
+            index = CatalogIndex(catalog['products'])
+            # Diffed on normalized keys, reported as the SKUs the catalog spells out
+            changes = {
+                "added": sorted(index.by_sku[key]['sku'] for key in index.by_sku.keys() - old_index.by_sku.keys()),
+                "removed": sorted(old_index.by_sku[key]['sku']
+                                  for key in old_index.by_sku.keys() - index.by_sku.keys()),
+                "changed": sorted(index.by_sku[key]['sku'] for key in index.by_sku.keys() & old_index.by_sku.keys()
+                                  if index.by_sku[key] != old_index.by_sku[key]),
+            }
+            if catalog == self.catalog:
+                return {"version": self.catalog_version, **changes}
+
+            phrases = self._matcher_shards(index)
+            stale = [key for key in self._matcher_phrases.keys() | phrases.keys()
+                     if self._matcher_phrases.get(key) != phrases.get(key)]
+            patterns = self._pattern_docs({key: phrases[key] for key in stale if key in phrases})
+            with self._matcher_lock:
+                for key in stale:
+                    if key in self.product_matcher:
+                        self.product_matcher.remove(key)
+                    if key in patterns:
+                        self.product_matcher.add(key, patterns[key])
+                self._matcher_phrases = phrases
+                self.catalog = catalog
+                self.catalog_index = index
+                self.catalog_version += 1
+            self._update_fingerprint()
+            return {"version": self.catalog_version, **changes}
+
+    def watch_catalog(self, interval: float = 5.0) -> threading.Event:
+        """Reload the catalog from a daemon thread whenever its file changes; set the returned event to stop"""
+        stop = threading.Event()
+
+        def watch():
+            last_seen = _file_stamp(self.catalog_path)
+            while not stop.wait(interval):
+                if (stamp := _file_stamp(self.catalog_path)) == last_seen or stamp is None:
+                    continue
+                try:
+                    changes = self.reload_catalog()
+                except (OSError, ValueError, KeyError) as e:
+                    # Most likely caught mid-write; try again on the next tick
+                    logger.warning("Catalog reload failed, keeping version %d: %s", self.catalog_version, e)
+                    continue
+                last_seen = stamp
+                logger.info("Catalog reloaded as version %d: %d added, %d removed, %d changed",
+                            changes["version"], len(changes["added"]), len(changes["removed"]),
+                            len(changes["changed"]))
+
+        threading.Thread(target=watch, name="catalog-watcher", daemon=True).start()
+        return stop
+
     def process_email(self, email_text: str) -> Dict:
-        doc = self.nlp(email_text)
-        text = email_text.lower()
+        if self.cache is None:
+            segments = segment_email(email_text)
+            return self._order_from(email_text, segments, self._parse(segments.text))
+        key = self.cache.key(email_text)
+        if (order_data := self.cache.get(key)) is None:
+            segments = segment_email(email_text)
+            order_data = self._order_from(email_text, segments, self._parse(segments.text))
+            self.cache.put(key, order_data)
+        return order_data
+
+    def _order_from(self, email_text: str, segments: EmailSegments, doc) -> Dict:
+        order_data = self._build_order(segments, doc)
+        if not order_data['products'] and segments.quoted:
+            # "Please process the order below" replies carry the order in the quoted history
+            if self.metrics is not None:
+                self.metrics.incr("quoted_fallback")
+            segments = segment_email(email_text, keep_quoted=True)
+            order_data = self._build_order(segments, self._parse(segments.text))
+        return order_data
+
+    def _parse(self, text: str):
+        return self.nlp(text, disable=self._lazy_pipes)
+
+    def process_batch(self, emails: Iterable[str], batch_size: int = 64, n_process: int = 1) -> Iterator[Dict]:
+        """Stream emails through nlp.pipe and yield order data in input order"""
+        # (cache key, cached result, email, segments) per input; only cache misses are sent through nlp.pipe
+        pending = deque()
+
+        def uncached():
+            for email_text in emails:
+                key = self.cache.key(email_text) if self.cache is not None else None
+                if key and (cached := self.cache.get(key)) is not None:
+                    pending.append((key, cached, None, None))
+                    continue
+                segments = segment_email(email_text)
+                pending.append((key, None, email_text, segments))
+                yield segments.text
+
+        docs = self.nlp.pipe(uncached(), batch_size=batch_size, n_process=n_process, disable=self._lazy_pipes)
+        if self.metrics is not None:
+            docs = self.metrics.timed_iter("parse", docs)
+        for doc in docs:
+            while pending[0][1] is not None:
+                yield pending.popleft()[1]
+            key, _, email_text, segments = pending.popleft()
+            order_data = self._order_from(email_text, segments, doc)
+            if key:
+                self.cache.put(key, order_data)
+            yield order_data
+        while pending:
+            yield pending.popleft()[1]
+
+    def _pipes_for(self, component: str) -> List:
+        """A component plus any tok2vec it listens to, in pipeline order"""
+        return [
+            (name, proc) for name, proc in self.nlp.pipeline
+            if name == component or component in getattr(proc, "listening_components", ())
+        ]
+
+    def _run_pipe(self, ctx: EmailContext, component: str) -> bool:
+        """Apply a lazily skipped component to the email's Doc"""
+        if component not in self.nlp.pipe_names:
+            return False
+        for name, proc in self._pipes_for(component):
+            if name not in ctx.applied_pipes:
+                proc(ctx.doc)
+                ctx.applied_pipes.add(name)
+                if self.metrics is not None:
+                    self.metrics.incr(f"nlp:{name}")
+        return True
+
+    def _region_entities(self, ctx: EmailContext, region) -> List:
+        """Run NER over one small region of the email rather than the whole Doc"""
+        if region is None or "ner" not in self.nlp.pipe_names:
+            return []
+        if not (span := ctx.span(*region)):
+            return []
+        region_doc = span.as_doc()
+        for name, proc in self._pipes_for("ner"):
+            region_doc = proc(region_doc)
+        if self.metrics is not None:
+            self.metrics.incr("nlp:ner")
+        return list(region_doc.ents)
+
+    def _build_order(self, segments: EmailSegments, doc) -> Dict:
+        applied = [name for name in self.nlp.pipe_names if name not in self._lazy_pipes]
+        ctx = EmailContext(segments, doc, applied)
+        ctx.hits = self.field_scanner.scan(ctx.text)
+        # Read once, so a concurrent reload cannot change the catalog halfway through an email
+        ctx.catalog_index = self.catalog_index
         
         order_data = {
-            "customer_name": self._extract_customer_name(doc),
-            "products": self._extract_products(email_text),
-            "shipping_address": self._extract_shipping_address(email_text),
-            "delivery_date": self._extract_delivery_date(email_text),
-            "special_instructions": self._extract_special_instructions(email_text),
-            "priority": self._detect_priority(text),
-            "contact": self._extract_contact_info(email_text),
-            "needs_review": False
+            "customer_name": self._extract_customer_name(ctx),
+            "products": self._extract_products(ctx),
+            "shipping_address": self._extract_shipping_address(ctx),
+            "delivery_date": self._extract_delivery_date(ctx),
+            "special_instructions": self._extract_special_instructions(ctx),
+            "priority": self._detect_priority(ctx),
+            "contact": self._extract_contact_info(ctx),
+            "needs_review": False,
+            "tiers": ctx.tiers
         }
         
+        for field in ("shipping_address", "delivery_date"):
+            if order_data[field]['value']:
+                ctx.tiers.setdefault(field, "regex")
         order_data["needs_review"] = self._needs_review(order_data)
         return order_data
 
-    def _extract_customer_name(self, doc) -> Dict:
-        for ent in doc.ents:
-            if ent.label_ == "PERSON":
-                return {"value": ent.text, "confidence": 0.95}
+    def _extract_customer_name(self, ctx: EmailContext) -> Dict:
+        name = {"value": None, "confidence": 0.1}
+        if self.mode == "tiered":
+            name = self._extract_signoff_name(ctx)
+            if name['confidence'] >= self.confidence_threshold:
+                ctx.tiers['customer_name'] = "regex"
+                return name
+        # The sender signs off; the greeting usually names the recipient, so it comes second
+        for region in (ctx.segments.signoff, ctx.segments.greeting):
+            for ent in self._region_entities(ctx, region):
+                if ent.label_ == "PERSON":
+                    ctx.tiers['customer_name'] = "ner"
+                    return {"value": ent.text, "confidence": 0.95}
+        if name['value']:
+            ctx.tiers['customer_name'] = "regex"
+        return name
+
+    def _extract_signoff_name(self, ctx: EmailContext) -> Dict:
+        """Cheap regex tier: the name line right after the sign-off ("Regards," etc.)"""
+        lines = [line.strip() for line in ctx.segments.signature.split('\n') if line.strip()]
+        if len(lines) >= 2 and (match := NAME_LINE_PATTERN.match(lines[1])):
+            value = match.group(1)
+            return {"value": value, "confidence": 0.85 if ' ' in value else 0.6}
         return {"value": None, "confidence": 0.1}
     
     
-    def _extract_products(self, text: str) -> List[Dict]:
+    def _extract_products(self, ctx: EmailContext) -> List[Dict]:
         products = []
         product_quantities = {}
+        match_confidence = {}
         
-        # Process each line looking for product patterns
-        for line in text.split('\n'):
-            line = line.strip()
-            
-            # Pattern 1: ITEM X: Product (SKU) - Qty: N
-            if match := re.match(r'(?i)ITEM\s+\d+:\s*(.+?)\s*\(([^)]+)\)\s*(?:-\s*Qty:\s*(\d+))?', line):
-                name, sku, qty = match.groups()
-                product = self._find_product_in_catalog(sku.strip())
-                if product:
-                    quantity = int(qty) if qty else self._extract_quantity_near_product(self.nlp(line), self.nlp(name)).get('value', 1)
-                    product_quantities[product['sku']] = quantity
-            
-            # Pattern 2: N Product (SKU)
-            elif match := re.match(r'^\s*(\d+)\s+(.+?)\s*\(([^)]+)\)', line, re.IGNORECASE):
-                qty, name, sku = match.groups()
-                product = self._find_product_in_catalog(sku.strip())
-                if product:
-                    product_quantities[product['sku']] = int(qty)
+        # Classify each line against the product line grammar in a single pass
+        ctx.tiers['products'] = "regex"
+        for offset, line in ctx.lines:
+            if not (line_match := self.line_grammar.classify(line)):
+                continue
             
-            # Pattern 3: Qty: N (standalone quantity mention)
-            elif match := re.search(r'(?i)(?:qty|quantity)\s*:\s*(\d+)', line):
-                # Try to associate with previous product if no direct match
-                if product_quantities and len(product_quantities) == 1:
+            # Standalone quantity mention: associate with the previous product if unambiguous
+            if line_match.sku is None:
+                if line_match.qty and len(product_quantities) == 1:
                     sku = next(iter(product_quantities.keys()))
-                    product_quantities[sku] = int(match.group(1))
-                    
-            # Pattern 4: - N Product (SKU) (bullet points)
-            elif match := re.match(r'^-\s*(\d+)\s+(.+?)\s*\(([^)]+)\)', line, re.IGNORECASE):
-                qty, name, sku = match.groups()
-                product = self._find_product_in_catalog(sku.strip())
-                if product:
-                    product_quantities[product['sku']] = int(qty)
+                    product_quantities[sku] = int(line_match.qty)
+                continue
             
-            # Pattern 5: N pairs of Product (SKU)
-            elif match := re.match(r'^(\d+)\s+pairs?\s+of\s+(.+?)\s*\(([^)]+)\)', line, re.IGNORECASE):
-                qty, name, sku = match.groups()
-                product = self._find_product_in_catalog(sku.strip())
-                if product:
-                    product_quantities[product['sku']] = int(qty)
-            
-            # Pattern 6: - N pairs of Product (SKU) (bullet points)
-            elif match := re.match(r'^-\s*(\d+)\s+pairs?\s+of\s+(.+?)\s*\(([^)]+)\)', line, re.IGNORECASE):
-                qty, name, sku = match.groups()
-                product = self._find_product_in_catalog(sku.strip())
-                if product:
-                    product_quantities[product['sku']] = int(qty)
-                    
-            # Pattern 7: Numbered list (1. N Product (SKU))
-            elif match := re.match(r'^\s*\d+\.\s*(\d+)\s*(?:x|\*)?\s*(.+?)\s*\(([^)]+)\)', line, re.IGNORECASE):
-                qty, name, sku = match.groups()
-                product = self._find_product_in_catalog(sku.strip())
-                if product:
-                    product_quantities[product['sku']] = int(qty)
+            product = ctx.catalog_index.lookup(line_match.sku.strip())
+            if not product:
+                product, confidence = self._match_product_fuzzy(line_match, ctx.catalog_index)
+                if not product:
+                    continue
+                match_confidence[product['sku']] = confidence
+                ctx.tiers['products'] = "fuzzy"
+            if line_match.qty:
+                quantity = int(line_match.qty)
+            elif line_match.name_span and (name_span := ctx.span(offset + line_match.name_span[0], offset + line_match.name_span[1])):
+                quantity = self._extract_quantity_near_product(ctx, name_span).get('value', 1)
+            else:
+                quantity = 1
+            product_quantities[product['sku']] = quantity
         
         # Fallback to NLP extraction if no structured data found
         if not product_quantities:
-            doc = self.nlp(text)
-            for match_id, start, end in self.product_matcher(doc):
+            ctx.tiers['products'] = "matcher"
+            if self.metrics is not None:
+                self.metrics.incr("product_fallback")
+            doc = ctx.doc
+            with self._matcher_lock:
+                matches = self.product_matcher(doc)
+            for match_id, start, end in matches:
                 product_span = doc[start:end]
-                product_info = self._find_product_in_catalog(product_span.text)
+                if product_span.start_char >= len(ctx.body):
+                    continue
+                product_info = ctx.catalog_index.lookup(product_span.text)
                 if product_info:
-                    quantity = self._extract_quantity_near_product(doc, product_span)
+                    quantity = self._extract_quantity_near_product(ctx, product_span)
                     if product_info['sku'] in product_quantities:
                         product_quantities[product_info['sku']] += quantity['value']
                     else:
                         product_quantities[product_info['sku']] = quantity['value']
         
+        # Free-text typos such as "Runing Shoes" that the exact matcher cannot see
+        if not product_quantities:
+            for product_span, product_info, confidence in self._match_body_fuzzy(ctx, ctx.catalog_index):
+                sku = product_info['sku']
+                quantity = self._extract_quantity_near_product(ctx, product_span)
+                product_quantities[sku] = product_quantities.get(sku, 0) + quantity['value']
+                match_confidence[sku] = min(confidence, match_confidence.get(sku, 1.0))
+        
+        if not product_quantities:
+            ctx.tiers.pop('products', None)
+        elif match_confidence:
+            # Any typo-tolerant line marks the whole field, even if a later line used the parser
+            ctx.tiers['products'] = "fuzzy"
+        
         # Create final products list
         for sku, quantity in product_quantities.items():
-            product = self._find_product_in_catalog(sku)
+            product = ctx.catalog_index.lookup(sku)
             if product:
                 products.append({
                     "sku": product['sku'],
                     "name": product['name'],
                     "quantity": quantity,
                     "price": float(product['price']),
-                    "confidence": 0.95 if quantity > 0 else 0.5
+                    "confidence": round((0.95 if quantity > 0 else 0.5) * match_confidence.get(sku, 1.0), 2)
                 })
         
         return products
+
+    def _match_product_fuzzy(self, line_match: LineMatch, index: CatalogIndex) -> Tuple[Optional[Dict], float]:
+        """Typo tolerant tier for structured lines whose SKU is not in the catalog"""
+        name = (line_match.name or "").strip()
+        if name and (product := index.lookup(name)):
+            # Exact product name next to an unknown SKU
+            return product, 0.9
+        best = (None, 0.0)
+        if name and (match := index.fuzzy_lookup(name, self.fuzzy_threshold)):
+            best = match
+        if (sku := line_match.sku.strip()) and (match := index.fuzzy_lookup(sku, self.fuzzy_threshold)):
+            # Catalogs number SKUs sequentially, so one edit away is often a different product;
+            # only trust a SKU match when the written name agrees with it
+            if match[1] > best[1] and name and index.name_matches(name, match[0], self.fuzzy_threshold):
+                best = match
+        if best[0] is not None and self.metrics is not None:
+            self.metrics.incr("fuzzy_match")
+        return best
+
+    def _match_body_fuzzy(self, ctx: EmailContext, index: CatalogIndex) -> Iterator[Tuple]:
+        """(span, product, confidence) for typos in the body's word windows, longest first; names and aliases only.
+
+        Only windows with one word spelled as in some catalog name are looked up, which keeps
+        the pass cheap and avoids matching unrelated words that happen to be one edit away.
+        """
+        doc = ctx.doc
+        body_end = len(ctx.body)
+        tokens = [token for token in doc if token.idx + len(token) <= body_end]
+        i = 0
+        while i < len(tokens):
+            first = tokens[i]
+            found = None
+            if first.is_alpha and not first.is_stop:
+                # (end_char, last token) of each window, grown one token at a time within the line
+                windows = []
+                words = 1
+                known_word = False
+                for j in range(i, len(tokens)):
+                    token = tokens[j]
+                    if j > i:
+                        words += bool(tokens[j - 1].whitespace_)
+                    if '\n' in token.text or words > index.max_name_words:
+                        break
+                    known_word = known_word or token.lower_ in index.name_words
+                    end_char = token.idx + len(token)
+                    if known_word and token.is_alpha and not token.is_stop and end_char - first.idx >= FUZZY_BODY_MIN_CHARS:
+                        windows.append((end_char, token))
+                for end_char, token in reversed(windows):
+                    window = ctx.text[first.idx:end_char]
+                    if (match := index.fuzzy_lookup(window, self.fuzzy_threshold)) \
+                            and index.name_matches(window, match[0], self.fuzzy_threshold):
+                        found = (doc[first.i:token.i + 1], *match)
+                        break
+            if found is None:
+                i += 1
+                continue
+            if self.metrics is not None:
+                self.metrics.incr("fuzzy_match")
+            yield found
+            i += len(found[0])
     
 
-    def _extract_shipping_address(self, text: str) -> Dict:
+    def _body_hits(self, ctx: EmailContext, rule: str) -> Iterator[Tuple[int, int]]:
+        return ctx.hits.iter(rule, len(ctx.body))
+
+    def _first_body_hit(self, ctx: EmailContext, rule: str) -> Optional[Tuple[int, int]]:
+        return ctx.hits.first(rule, len(ctx.body))
+
+    def _extract_shipping_address(self, ctx: EmailContext) -> Dict:
+        text = ctx.body
         address = {"value": None, "confidence": 0.0}
+        # Keywords keep their configured precedence; only the first mention of each is used
+        first_hits = {}
+        for start, end in self._body_hits(ctx, "address"):
+            first_hits.setdefault(text[start:end].lower(), end)
+            if len(first_hits) == len(self.address_keywords):
+                break
         for keyword in self.address_keywords:
-            if match := re.search(fr'(?i){keyword}[:\s]*(.*?)(?:\n\n|\Z)', text, re.DOTALL):
+            if keyword.lower() in first_hits:
+                match = SECTION_TAIL.match(text, first_hits[keyword.lower()])
                 address_text = match.group(1).strip()
                 if len(address_text.split('\n')) >= 2:
                     address = {
@@ -152,96 +649,99 @@ class OrderProcessor:
         return address
 
 
-    def _extract_delivery_date(self, text: str) -> Dict:
+    def _extract_delivery_date(self, ctx: EmailContext) -> Dict:
         """Enhanced delivery date extraction that handles multiple formats"""
-        date_patterns = [
-            r'(?:required by|due by|by|needed by|arrive by)\s*([A-Za-z]+\s+\d{1,2}(?:\s*,\s*\d{4})?)',
-            r'(?:delivery date|deliver by)\s*:\s*([A-Za-z]+\s+\d{1,2}(?:\s*,\s*\d{4})?)',
-            r'need these by\s*(next\s+[A-Za-z]+|next\s+week|tomorrow)',
-            r'must arrive before\s*([A-Za-z]+\s+\d{1,2}(?:\s*,\s*\d{4})?)',
-            r'(\bMarch\s+\d{1,2}\b|\bApr(?:il)?\s+\d{1,2}\b|\bMay\s+\d{1,2}\b|\bJun(?:e)?\s+\d{1,2}\b|\bJul(?:y)?\s+\d{1,2}\b|\bAug(?:ust)?\s+\d{1,2}\b|\bSep(?:tember)?\s+\d{1,2}\b|\bOct(?:ober)?\s+\d{1,2}\b|\bNov(?:ember)?\s+\d{1,2}\b|\bDec(?:ember)?\s+\d{1,2}\b|\bJan(?:uary)?\s+\d{1,2}\b|\bFeb(?:ruary)?\s+\d{1,2}\b)'
-        ]
-        
-        for pattern in date_patterns:
-            if match := re.search(pattern, text, re.IGNORECASE):
-                date_str = match.group(1).strip()
-                try:
-                    date = parser.parse(date_str, fuzzy=True)
-                    return {
-                        "value": date.strftime("%Y-%m-%d"),
-                        "confidence": 0.9
-                    }
-                except:
-                    continue
+        text = ctx.body
+        for date_str in self._date_candidates(ctx):
+            try:
+                date = parser.parse(date_str.strip(), fuzzy=True)
+                if not YEAR_PATTERN.search(date_str):
+                    # The parser fills the missing year from today, so the value moves with the calendar
+                    ctx.tiers['delivery_date'] = "relative"
+                return {
+                    "value": date.strftime("%Y-%m-%d"),
+                    "confidence": 0.9
+                }
+            except:
+                continue
         
         # Handle relative dates like "next Friday"
-        if "next Friday" in text:
+        if any(text[start:end] == "next Friday" for start, end in self._body_hits(ctx, "next_friday")):
             today = datetime.now()
             days_ahead = (4 - today.weekday()) % 7  # Friday is weekday 4
             if days_ahead <= 0:  # If today is Friday or after
                 days_ahead += 7  # Get next Friday
             next_friday = today + timedelta(days=days_ahead)
+            ctx.tiers['delivery_date'] = "relative"
             return {
                 "value": next_friday.strftime("%Y-%m-%d"),
                 "confidence": 0.8
             }
         
         return {"value": None, "confidence": 0.0}
+
+    def _date_candidates(self, ctx: EmailContext) -> Iterator[str]:
+        """First date string for each trigger rule, in rule precedence order"""
+        for rule, _, tail in DATE_TRIGGERS:
+            for start, end in self._body_hits(ctx, rule):
+                if match := tail.match(ctx.body, end):
+                    yield match.group(1)
+                    break
+        if month_hit := self._first_body_hit(ctx, "date_month"):
+            start, end = month_hit
+            yield ctx.body[start:end]
     
 
-    def _extract_special_instructions(self, text: str) -> List[str]:
+    def _extract_special_instructions(self, ctx: EmailContext) -> List[str]:
         instructions = []
-        if match := re.search(r'(?i)special instructions:?(.*?)(?:\n\n|\Z)', text, re.DOTALL):
+        if hit := self._first_body_hit(ctx, "instructions"):
+            match = INSTRUCTIONS_TAIL.match(ctx.body, hit[1])
             for line in match.group(1).split('\n'):
                 if line.strip():
                     instructions.append(line.strip())
         return instructions
 
-    def _extract_contact_info(self, text: str) -> Dict:
+    def _extract_contact_info(self, ctx: EmailContext) -> Dict:
         contact = {}
-        if email_match := re.search(r'([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})', text):
-            contact['email'] = email_match.group(1)
-        if phone_match := re.search(r'(\(\d{3}\) \d{3}-\d{4})', text):
-            contact['phone'] = phone_match.group(1)
+        if email_hit := ctx.hits.first("email"):
+            contact['email'] = ctx.text[email_hit[0]:email_hit[1]]
+        if phone_hit := ctx.hits.first("phone"):
+            contact['phone'] = ctx.text[phone_hit[0]:phone_hit[1]]
         return contact
 
-    def _detect_priority(self, text: str) -> str:
-        return "urgent" if any(kw in text.lower() for kw in self.priority_keywords) else "normal"
+    def _detect_priority(self, ctx: EmailContext) -> str:
+        return "urgent" if self._first_body_hit(ctx, "priority") else "normal"
 
 
-    def _extract_quantity_near_product(self, doc, product_span) -> Dict:
+    def _extract_quantity_near_product(self, ctx: EmailContext, product_span) -> Dict:
         """Extract quantity near product in the document"""
+        doc = ctx.doc
+        if self.mode == "tiered" and not doc.has_annotation("SENT_START"):
+            quantity = self._extract_quantity_in_window(doc, product_span)
+            if quantity and quantity['confidence'] >= self.confidence_threshold:
+                return quantity
+            self._run_pipe(ctx, "parser")
+        
         # Look in the same sentence if available
-        if hasattr(product_span, 'sent'):
+        if doc.has_annotation("SENT_START"):
             for token in product_span.sent:
                 if token.like_num and token.i < product_span.end + 5:  # Look a few tokens ahead
+                    ctx.tiers['products'] = "parser"
                     return {"value": int(token.text), "confidence": 0.9}
         
-        # Fallback to looking in nearby tokens
+        # Fallback to looking in nearby tokens, then to a single unit
+        return self._extract_quantity_in_window(doc, product_span) or {"value": 1, "confidence": 0.5}
+
+    def _extract_quantity_in_window(self, doc, product_span) -> Optional[Dict]:
         start = max(0, product_span.start - 3)
         end = min(len(doc), product_span.end + 3)
         for token in doc[start:end]:
             if token.like_num:
                 return {"value": int(token.text), "confidence": 0.7}
-        
-        # Final fallback
-        return {"value": 1, "confidence": 0.5}
+        return None
 
     def _find_product_in_catalog(self, text: str) -> Optional[Dict]:
-        text_lower = text.lower()
-        for product in self.catalog['products']:
-            if text_lower == product['name'].lower() or text_lower == product['sku'].lower():
-                return product
-        return None
+        return self.catalog_index.lookup(text)
 
     def _needs_review(self, order_data: Dict) -> bool:
-        if not order_data['customer_name']['value'] or order_data['customer_name']['confidence'] < 0.5:
-            return True
-        if not order_data['products']:
-            return True
-        if not order_data['shipping_address']['value']:
-            return True
-        for product in order_data['products']:
-            if product['quantity'] <= 0 or product['quantity'] > 1000:
-                return True
-        return False
\ No newline at end of file
+        return bool(review_reasons(order_data, self.rules))
\ No newline at end of file
@@ -0,0 +1,257 @@
+import csv
+import io
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ORDER_COLUMNS = [
+    "order_id", "source", "customer_name", "customer_confidence", "shipping_address",
+    "shipping_confidence", "delivery_date", "delivery_confidence", "priority", "email", "phone",
+    "special_instructions", "needs_review", "item_count", "order_total",
+]
+ITEM_COLUMNS = ["order_id", "source", "sku", "name", "quantity", "price", "confidence", "line_total"]
+WRITER_FORMATS = (".jsonl", ".csv", ".parquet")
+
+
+@dataclass
+class ScoredField:
+    __slots__ = ("value", "confidence")
+    value: Optional[str]
+    confidence: float
+
+    def to_dict(self) -> Dict:
+        return {"value": self.value, "confidence": self.confidence}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ScoredField":
+        return cls(data['value'], data['confidence'])
+
+
+@dataclass
+class ProductLine:
+    __slots__ = ("sku", "name", "quantity", "price", "confidence")
+    sku: str
+    name: str
+    quantity: int
+    price: float
+    confidence: float
+
+    @property
+    def total(self) -> float:
+        return round(self.quantity * self.price, 2)
+
+    def to_dict(self) -> Dict:
+        return {"sku": self.sku, "name": self.name, "quantity": self.quantity,
+                "price": self.price, "confidence": self.confidence}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ProductLine":
+        return cls(data['sku'], data['name'], data['quantity'], data['price'], data['confidence'])
+
+
+@dataclass
+class OrderRecord:
+    """Slotted form of the dict process_email returns; to_dict() gives back the same shape"""
+    __slots__ = ("customer_name", "products", "shipping_address", "delivery_date",
+                 "special_instructions", "priority", "contact", "needs_review", "tiers")
+    customer_name: ScoredField
+    products: List[ProductLine]
+    shipping_address: ScoredField
+    delivery_date: ScoredField
+    special_instructions: List[str]
+    priority: str
+    contact: Dict[str, str]
+    needs_review: bool
+    tiers: Dict[str, str]
+
+    @property
+    def total(self) -> float:
+        return sum(product.total for product in self.products)
+
+    def to_dict(self) -> Dict:
+        return {
+            "customer_name": self.customer_name.to_dict(),
+            "products": [product.to_dict() for product in self.products],
+            "shipping_address": self.shipping_address.to_dict(),
+            "delivery_date": self.delivery_date.to_dict(),
+            "special_instructions": self.special_instructions,
+            "priority": self.priority,
+            "contact": self.contact,
+            "needs_review": self.needs_review,
+            "tiers": self.tiers,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "OrderRecord":
+        return cls(
+            ScoredField.from_dict(data['customer_name']),
+            [ProductLine.from_dict(product) for product in data['products']],
+            ScoredField.from_dict(data['shipping_address']),
+            ScoredField.from_dict(data['delivery_date']),
+            data['special_instructions'],
+            data['priority'],
+            data['contact'],
+            data['needs_review'],
+            data.get('tiers', {}),
+        )
+
+
+Order = Union[Dict, OrderRecord]
+
+
+def _as_record(order: Order) -> OrderRecord:
+    return order if isinstance(order, OrderRecord) else OrderRecord.from_dict(order)
+
+
+def dumps(order: Order, pretty: bool = False) -> bytes:
+    """UTF-8 JSON for an order dict or record, through orjson when it is installed"""
+    if isinstance(order, OrderRecord):
+        order = order.to_dict()
+    if orjson is not None:
+        return orjson.dumps(order, option=orjson.OPT_INDENT_2 if pretty else 0)
+    if pretty:
+        return json.dumps(order, indent=2, ensure_ascii=False).encode()
+    return json.dumps(order, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def loads(data: Union[bytes, str]) -> Dict:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def order_row(order: Order, order_id: int, source: Optional[str] = None) -> Tuple:
+    """One ORDER_COLUMNS row; the nested fields are flattened"""
+    record = _as_record(order)
+    return (
+        order_id, source,
+        record.customer_name.value, record.customer_name.confidence,
+        record.shipping_address.value, record.shipping_address.confidence,
+        record.delivery_date.value, record.delivery_date.confidence,
+        record.priority, record.contact.get('email'), record.contact.get('phone'),
+        "\n".join(record.special_instructions), record.needs_review,
+        sum(product.quantity for product in record.products), record.total,
+    )
+
+
+def item_rows(order: Order, order_id: int, source: Optional[str] = None) -> List[Tuple]:
+    """ITEM_COLUMNS rows for each product line of an order"""
+    return [
+        (order_id, source, product.sku, product.name, product.quantity, product.price, product.confidence,
+         product.total)
+        for product in _as_record(order).products
+    ]
+
+
+def line_items_csv(orders: Iterable[Tuple[int, Order, Optional[str]]]) -> str:
+    """CSV text of every line item of (order_id, order, source) triples"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(ITEM_COLUMNS)
+    for order_id, order, source in orders:
+        writer.writerows(item_rows(order, order_id, source))
+    return buffer.getvalue()
+
+
+def _parquet_schemas():
+    import pyarrow as pa
+    orders = pa.schema([
+        ("order_id", pa.int64()), ("source", pa.string()),
+        ("customer_name", pa.string()), ("customer_confidence", pa.float64()),
+        ("shipping_address", pa.string()), ("shipping_confidence", pa.float64()),
+        ("delivery_date", pa.string()), ("delivery_confidence", pa.float64()),
+        ("priority", pa.string()), ("email", pa.string()), ("phone", pa.string()),
+        ("special_instructions", pa.string()), ("needs_review", pa.bool_()),
+        ("item_count", pa.int64()), ("order_total", pa.float64()),
+    ])
+    items = pa.schema([
+        ("order_id", pa.int64()), ("source", pa.string()), ("sku", pa.string()), ("name", pa.string()),
+        ("quantity", pa.int64()), ("price", pa.float64()), ("confidence", pa.float64()),
+        ("line_total", pa.float64()),
+    ])
+    return orders, items
+
+
+class BatchWriter:
+    """Stream orders to disk in chunks of `chunk_size`, never holding a whole batch.
+
+    The format follows the suffix. JSON Lines writes one nested order per line. CSV and
+    Parquet (which needs pyarrow) write two tables, <stem>.orders<suffix> and
+    <stem>.items<suffix>, joined on order_id.
+    """
+
+    def __init__(self, path: str, chunk_size: int = 10000):
+        self.path = Path(path)
+        self.format = self.path.suffix.lower()
+        if self.format not in WRITER_FORMATS:
+            raise ValueError(f"Unsupported output '{path}', expected one of {WRITER_FORMATS}")
+        self.chunk_size = chunk_size
+        self.orders = 0
+        self.items = 0
+        self._order_rows = []
+        self._item_rows = []
+        self._lines = []
+        if self.format == ".jsonl":
+            self.outputs = [self.path]
+            self._files = [open(self.path, 'wb')]
+            return
+        self.outputs = [self.path.with_suffix(f".orders{self.format}"), self.path.with_suffix(f".items{self.format}")]
+        if self.format == ".csv":
+            self._files = [open(output, 'w', newline='') for output in self.outputs]
+            self._csv = [csv.writer(f) for f in self._files]
+            self._csv[0].writerow(ORDER_COLUMNS)
+            self._csv[1].writerow(ITEM_COLUMNS)
+        else:
+            import pyarrow.parquet as pq
+            self._schemas = _parquet_schemas()
+            self._files = [pq.ParquetWriter(output, schema) for output, schema in zip(self.outputs, self._schemas)]
+
+    def write(self, order: Order, source: Optional[str] = None):
+        if self.format == ".jsonl":
+            order = order.to_dict() if isinstance(order, OrderRecord) else order
+            self._lines.append(dumps({"source": source, **order}) if source is not None else dumps(order))
+            self.items += len(order['products'])
+        else:
+            record = _as_record(order)
+            self._order_rows.append(order_row(record, self.orders, source))
+            items = item_rows(record, self.orders, source)
+            self._item_rows.extend(items)
+            self.items += len(items)
+        self.orders += 1
+        if self.orders % self.chunk_size == 0:
+            self.flush()
+
+    def flush(self):
+        if self.format == ".jsonl":
+            if self._lines:
+                self._files[0].write(b"\n".join(self._lines) + b"\n")
+        elif self.format == ".csv":
+            self._csv[0].writerows(self._order_rows)
+            self._csv[1].writerows(self._item_rows)
+        else:
+            import pyarrow as pa
+            for writer, schema, rows in zip(self._files, self._schemas, (self._order_rows, self._item_rows)):
+                if rows:
+                    # Transpose to columns so Arrow builds each array in one pass
+                    columns = list(zip(*rows))
+                    writer.write_table(pa.Table.from_arrays(
+                        [pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema
+                    ))
+        self._lines = []
+        self._order_rows = []
+        self._item_rows = []
+
+    def close(self):
+        self.flush()
+        for f in self._files:
+            f.close()
+
+    def __enter__(self) -> "BatchWriter":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
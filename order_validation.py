@@ -0,0 +1,324 @@
+import argparse
+import csv
+import json
+from dataclasses import asdict, dataclass, fields
+from itertools import repeat
+from operator import itemgetter
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+from order_records import Order, OrderRecord, loads
+
+REVIEW_REASONS = {
+    "customer": "Customer name missing or low confidence",
+    "no_products": "No products identified",
+    "shipping_address": "No shipping address",
+    "quantity_range": "Quantity outside the allowed range",
+    "product_confidence": "Low-confidence product match",
+    "fuzzy_match": "Weak typo-tolerant product match",
+    "order_total": "Order total above the limit",
+    "unknown_sku": "SKU no longer in the catalog",
+    "price_changed": "Price differs from the current catalog",
+    "quantity_outlier": "Quantity unusual for this SKU",
+}
+
+
+@dataclass
+class ValidationRules:
+    """Review thresholds; the defaults are OrderProcessor's checks plus weak typo-tolerant matches"""
+    require_customer: bool = True
+    min_customer_confidence: float = 0.5
+    require_products: bool = True
+    require_shipping_address: bool = True
+    min_quantity: int = 1
+    max_quantity: int = 1000
+    min_product_confidence: float = 0.0
+    # Typo-tolerant matches are only reviewed below this product confidence; None never reviews them
+    min_fuzzy_confidence: Optional[float] = 0.85
+    max_order_total: Optional[float] = None
+    # The checks below need the catalog or quantity history, so only batch validation runs them
+    flag_unknown_sku: bool = True
+    price_tolerance: Optional[float] = 0.01
+    outlier_threshold: Optional[float] = 3.5
+    min_history: int = 20
+
+    @classmethod
+    def load(cls, path: str) -> "ValidationRules":
+        """Rules from a JSON object; omitted keys keep their defaults"""
+        with open(path, 'r') as f:
+            settings = json.load(f)
+        if unknown := set(settings) - {field.name for field in fields(cls)}:
+            raise ValueError(f"Unknown validation rules in {path}: {', '.join(sorted(unknown))}")
+        return cls(**settings)
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+def _as_dict(order: Order) -> Dict:
+    return order.to_dict() if isinstance(order, OrderRecord) else order
+
+
+def review_reasons(order: Dict, rules: ValidationRules) -> List[str]:
+    """The REVIEW_REASONS keys one extracted order fails, without the catalog or history checks"""
+    reasons = []
+    customer = order['customer_name']
+    if rules.require_customer and (not customer['value'] or customer['confidence'] < rules.min_customer_confidence):
+        reasons.append("customer")
+    if rules.require_products and not order['products']:
+        reasons.append("no_products")
+    if rules.require_shipping_address and not order['shipping_address']['value']:
+        reasons.append("shipping_address")
+    products = order['products']
+    if any(not rules.min_quantity <= product['quantity'] <= rules.max_quantity for product in products):
+        reasons.append("quantity_range")
+    if any(product['confidence'] < rules.min_product_confidence for product in products):
+        reasons.append("product_confidence")
+    if rules.min_fuzzy_confidence is not None and order.get('tiers', {}).get('products') == "fuzzy":
+        if any(product['confidence'] < rules.min_fuzzy_confidence for product in products):
+            reasons.append("fuzzy_match")
+    if rules.max_order_total is not None:
+        if sum(product['quantity'] * product['price'] for product in products) > rules.max_order_total:
+            reasons.append("order_total")
+    return reasons
+
+
+class PriceBook:
+    """Catalog prices as one array, with SKUs mapped to positions for vectorized joins"""
+
+    def __init__(self, products: List[Dict]):
+        self.codes = {}
+        prices = []
+        for product in products:
+            if product['sku'] not in self.codes:
+                self.codes[product['sku']] = len(prices)
+                prices.append(product['price'])
+        self.prices = np.array(prices, dtype=np.float64)
+
+    @classmethod
+    def from_file(cls, catalog_path: str) -> "PriceBook":
+        with open(catalog_path, 'r') as f:
+            return cls(json.load(f)['products'])
+
+    def lookup(self, skus: Sequence[str]) -> np.ndarray:
+        """Position of each SKU in `prices`, or -1 when the catalog no longer has it"""
+        return np.fromiter(map(self.codes.get, skus, repeat(-1)), dtype=np.int64, count=len(skus))
+
+
+def _group_medians(groups: np.ndarray, values: np.ndarray, count: int) -> np.ndarray:
+    """Median of `values` within each of `count` groups, from one sort; NaN for empty groups"""
+    sorted_values = values[np.lexsort((values, groups))]
+    sizes = np.bincount(groups, minlength=count)
+    starts = np.cumsum(sizes) - sizes
+    medians = np.full(count, np.nan)
+    present = sizes > 0
+    lower = starts[present] + (sizes[present] - 1) // 2
+    upper = starts[present] + sizes[present] // 2
+    medians[present] = (sorted_values[lower] + sorted_values[upper]) / 2
+    return medians
+
+
+class QuantityHistory:
+    """Per-SKU median and median absolute deviation of past quantities.
+
+    Robust z-scores against these stay meaningful when the history itself contains a few
+    mistyped quantities, which would drag a mean and standard deviation along with them.
+    """
+
+    def __init__(self, skus: Sequence[str], quantities: Sequence[float]):
+        self.codes = {}
+        groups = np.fromiter((self.codes.setdefault(sku, len(self.codes)) for sku in skus),
+                             dtype=np.int64, count=len(skus))
+        values = np.asarray(quantities, dtype=np.float64)
+        count = len(self.codes)
+        self.counts = np.bincount(groups, minlength=count)
+        self.medians = _group_medians(groups, values, count)
+        self.mads = _group_medians(groups, np.abs(values - self.medians[groups]), count)
+
+    @classmethod
+    def from_orders(cls, orders: Iterable[Order]) -> "QuantityHistory":
+        skus = []
+        quantities = []
+        for order in orders:
+            for product in _as_dict(order)['products']:
+                skus.append(product['sku'])
+                quantities.append(product['quantity'])
+        return cls(skus, quantities)
+
+    def scores(self, skus: Sequence[str], quantities: np.ndarray, min_history: int) -> np.ndarray:
+        """Robust z-score of each quantity, 0 where the SKU has fewer than min_history past lines"""
+        groups = np.fromiter(map(self.codes.get, skus, repeat(-1)), dtype=np.int64, count=len(skus))
+        known = groups >= 0
+        known[known] = self.counts[groups[known]] >= min_history
+        scores = np.zeros(len(skus))
+        # A MAD of 0 (every past order the same size) is floored at one unit, not divided by
+        mads = np.maximum(self.mads[groups[known]], 1.0)
+        scores[known] = 0.6745 * np.abs(quantities[known] - self.medians[groups[known]]) / mads
+        return scores
+
+
+@dataclass
+class BatchValidation:
+    """Column arrays for a validated batch: one entry per order, and one per line item"""
+    order_total: np.ndarray
+    units: np.ndarray
+    needs_review: np.ndarray
+    reasons: Dict[str, np.ndarray]
+    item_order: np.ndarray
+    line_total: np.ndarray
+    quantity_score: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.order_total)
+
+    def order_reasons(self, index: int) -> List[str]:
+        return [reason for reason, flags in self.reasons.items() if flags[index]]
+
+    def annotate(self, orders: Sequence[Order]) -> List[Dict]:
+        """Copies of the validated orders carrying this batch's needs_review, so views and exports agree"""
+        return [{**_as_dict(order), "needs_review": bool(flag)} for order, flag in zip(orders, self.needs_review)]
+
+    def line_totals(self, index: int) -> np.ndarray:
+        return self.line_total[self.item_order == index]
+
+    def summary(self) -> Dict:
+        return {
+            "orders": len(self),
+            "needs_review": int(self.needs_review.sum()),
+            "total": round(float(self.order_total.sum()), 2),
+            "reasons": {reason: int(flags.sum()) for reason, flags in self.reasons.items() if flags.any()},
+        }
+
+
+def validate_orders(orders: Sequence[Order], rules: Optional[ValidationRules] = None,
+                    prices: Optional[PriceBook] = None,
+                    history: Optional[QuantityHistory] = None) -> BatchValidation:
+    """Price and check a whole batch at once.
+
+    Orders are flattened into line-item arrays once; every rule is then an array comparison
+    and every per-order roll-up a bincount over the line's order index. Lines are priced at
+    the current catalog price when `prices` is given, otherwise at the extracted price.
+    """
+    rules = rules or ValidationRules()
+    orders = [_as_dict(order) for order in orders]
+    count = len(orders)
+    products = [product for order in orders for product in order['products']]
+    item_order = np.repeat(np.arange(count), [len(order['products']) for order in orders])
+    skus = list(map(itemgetter('sku'), products))
+    quantity, price, confidence = (
+        np.fromiter(map(itemgetter(column), products), dtype=np.float64, count=len(products))
+        for column in ("quantity", "price", "confidence")
+    )
+
+    line_flags = {
+        "quantity_range": (quantity < rules.min_quantity) | (quantity > rules.max_quantity),
+        "product_confidence": confidence < rules.min_product_confidence,
+    }
+    if rules.min_fuzzy_confidence is not None:
+        fuzzy = np.array([order.get('tiers', {}).get('products') == "fuzzy" for order in orders], dtype=bool)
+        line_flags["fuzzy_match"] = fuzzy[item_order] & (confidence < rules.min_fuzzy_confidence)
+    if prices is not None:
+        codes = prices.lookup(skus)
+        known = codes >= 0
+        catalog_price = np.full(len(codes), np.nan)
+        catalog_price[known] = prices.prices[codes[known]]
+        if rules.flag_unknown_sku:
+            line_flags["unknown_sku"] = ~known
+        if rules.price_tolerance is not None:
+            line_flags["price_changed"] = known & (np.abs(price - catalog_price) > rules.price_tolerance)
+        price = np.where(known, catalog_price, price)
+    quantity_score = np.zeros(len(products))
+    if history is not None and rules.outlier_threshold is not None:
+        quantity_score = history.scores(skus, quantity, rules.min_history)
+        line_flags["quantity_outlier"] = quantity_score > rules.outlier_threshold
+
+    line_total = np.round(quantity * price, 2)
+    order_total = np.round(np.bincount(item_order, weights=line_total, minlength=count), 2)
+    units = np.bincount(item_order, weights=quantity, minlength=count).astype(np.int64)
+
+    reasons = {}
+    if rules.require_customer:
+        customer_confidence = np.array([
+            order['customer_name']['confidence'] if order['customer_name']['value'] else -1.0 for order in orders
+        ], dtype=np.float64)
+        reasons["customer"] = customer_confidence < rules.min_customer_confidence
+    if rules.require_products:
+        reasons["no_products"] = np.bincount(item_order, minlength=count) == 0
+    if rules.require_shipping_address:
+        reasons["shipping_address"] = np.array([not order['shipping_address']['value'] for order in orders], dtype=bool)
+    for reason, flags in line_flags.items():
+        reasons[reason] = np.bincount(item_order, weights=flags, minlength=count) > 0
+    if rules.max_order_total is not None:
+        reasons["order_total"] = order_total > rules.max_order_total
+
+    needs_review = np.zeros(count, dtype=bool)
+    for flags in reasons.values():
+        needs_review |= flags
+    return BatchValidation(order_total, units, needs_review, reasons, item_order, line_total, quantity_score)
+
+
+def iter_order_lines(path: str) -> Iterator[Tuple[Optional[str], Dict]]:
+    """(source, order) pairs from `work_queue.py export` or `main.py --output` JSON lines"""
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = loads(line)
+            if "order" in row:
+                yield row.get('source'), row['order']
+            else:
+                yield row.pop('source', None), row
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Reprice and re-check a day's extracted orders in one pass")
+    parser.add_argument("orders", nargs="+", help="JSON lines files of extracted orders")
+    parser.add_argument("--catalog", default="data/product_catalog.json", help="Catalog to price line items against")
+    parser.add_argument("--rules", help="JSON file overriding ValidationRules defaults")
+    parser.add_argument("--history", nargs="*", default=[],
+                        help="Earlier order files that set each SKU's usual quantities")
+    parser.add_argument("--out", default="review.csv", help="CSV of the orders that need review")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    from rich.console import Console
+    from rich.table import Table
+    console = Console()
+    rules = ValidationRules.load(args.rules) if args.rules else ValidationRules()
+    history = None
+    if args.history:
+        history = QuantityHistory.from_orders(
+            order for path in args.history for _, order in iter_order_lines(path)
+        )
+    sources = []
+    orders = []
+    for path in args.orders:
+        for source, order in iter_order_lines(path):
+            sources.append(source or path)
+            orders.append(order)
+
+    validation = validate_orders(orders, rules, PriceBook.from_file(args.catalog), history)
+    with open(args.out, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["order_id", "source", "customer_name", "order_total", "units", "reasons"])
+        for index in np.flatnonzero(validation.needs_review):
+            writer.writerow([
+                index, sources[index], orders[index]['customer_name']['value'],
+                validation.order_total[index], validation.units[index],
+                ";".join(validation.order_reasons(index)),
+            ])
+
+    summary = validation.summary()
+    table = Table(title="Validation", show_header=True, header_style="bold magenta")
+    table.add_column("Check")
+    table.add_column("Orders flagged")
+    for reason, flagged in summary['reasons'].items():
+        table.add_row(REVIEW_REASONS[reason], str(flagged))
+    console.print(table)
+    console.print(f"{summary['needs_review']} of {summary['orders']} orders need review "
+                  f"(batch total ${summary['total']:,.2f}); wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
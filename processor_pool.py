@@ -0,0 +1,219 @@
+import json
+import logging
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Dict, List, Optional, Sequence, Tuple
+from extraction_cache import ExtractionCache, catalog_fingerprint
+from order_processor import _file_stamp
+
+logger = logging.getLogger(__name__)
+
+# One processor per worker process, built by the pool initializer
+_processor = None
+_catalog_stamp = None
+
+
+class PoolBusy(RuntimeError):
+    """The pool already has max_pending emails queued; the caller should retry later"""
+
+
+def _init_worker(catalog_path: str, mode: str):
+    global _processor, _catalog_stamp
+    from order_processor import OrderProcessor
+    _catalog_stamp = _file_stamp(catalog_path)
+    _processor = OrderProcessor(catalog_path, mode=mode)
+
+
+def _process_batch(texts: List[str]) -> List[Dict]:
+    global _catalog_stamp
+    # Pick up catalog edits before extracting, so results never lag the parent's cache key
+    if (stamp := _file_stamp(_processor.catalog_path)) not in (None, _catalog_stamp):
+        try:
+            _processor.reload_catalog()
+            _catalog_stamp = stamp
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Catalog reload failed, keeping version %d: %s", _processor.catalog_version, e)
+    return list(_processor.process_batch(texts, batch_size=len(texts)))
+
+
+class ProcessorPool:
+    """OrderProcessors in worker processes behind a bounded queue, memoized by email content.
+
+    Each worker process holds its own spaCy pipeline, so concurrent callers never wait on
+    one another's parse. Results are cached in this process by content hash, and identical
+    emails submitted while one is still running share its future.
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 64,
+                 catalog_path: str = "data/product_catalog.json", mode: str = "full",
+                 cache_size: int = 10000):
+        self.catalog_path = catalog_path
+        self.mode = mode
+        self.max_pending = max_pending
+        self.cache = ExtractionCache(max_entries=cache_size)
+        self._pending = 0
+        self._inflight = {}
+        self._catalog_stamp = None
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._executor = self._start_executor()
+
+    def _start_executor(self) -> ProcessPoolExecutor:
+        # spawn, because forking a threaded server (Streamlit, asyncio) can deadlock the child
+        return ProcessPoolExecutor(
+            self.workers, mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker, initargs=(self.catalog_path, self.mode)
+        )
+
+    def _sync_fingerprint(self):
+        """Re-key the memo when the catalog file changes, which also drops stale results"""
+        if (stamp := _file_stamp(self.catalog_path)) == self._catalog_stamp:
+            return
+        try:
+            with open(self.catalog_path, 'r') as f:
+                catalog = json.load(f)
+        except (OSError, ValueError) as e:
+            # Most likely caught mid-write; keep the old key and look again on the next call
+            logger.warning("Catalog reload failed, keeping the previous cache key: %s", e)
+            return
+        self._catalog_stamp = stamp
+        self.cache.attach(catalog_fingerprint(catalog, self.mode))
+
+    def _submit(self, texts: List[str]) -> Future:
+        """Submit to the workers, replacing the executor if a worker process died"""
+        executor = self._executor
+        try:
+            return executor.submit(_process_batch, texts)
+        except BrokenProcessPool:
+            with self._lock:
+                if self._executor is executor:
+                    logger.warning("A worker process died; restarting the pool")
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    self._executor = self._start_executor()
+            return self._executor.submit(_process_batch, texts)
+
+    def submit_batch(self, texts: List[str]) -> List[Future]:
+        """One future per email; all uncached emails are extracted together in one worker batch"""
+        futures = []
+        misses = {}
+        with self._lock:
+            self._sync_fingerprint()
+            for text in texts:
+                key = self.cache.key(text)
+                if (future := self._inflight.get(key)) is None and key in misses:
+                    future = misses[key][1]
+                if future is None:
+                    future = Future()
+                    if (result := self.cache.get(key)) is not None:
+                        future.set_result(result)
+                    else:
+                        misses[key] = (text, future)
+                futures.append(future)
+            if self._pending + len(misses) > self.max_pending:
+                raise PoolBusy(f"{self._pending} emails already queued (limit {self.max_pending})")
+            self._pending += len(misses)
+            self._inflight.update((key, future) for key, (_, future) in misses.items())
+        if misses:
+            try:
+                batch = self._submit([text for text, _ in misses.values()])
+            except Exception as e:
+                batch = Future()
+                batch.set_exception(e)
+            batch.add_done_callback(partial(self._finish, list(misses.items())))
+        return futures
+
+    def _finish(self, items: List, batch: Future):
+        error = batch.exception()
+        results = batch.result() if error is None else [None] * len(items)
+        with self._lock:
+            self._pending -= len(items)
+            for (key, _), result in zip(items, results):
+                self._inflight.pop(key, None)
+                if result is not None:
+                    self.cache.put(key, result)
+        for (_, (_, future)), result in zip(items, results):
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def process(self, email_text: str, timeout: Optional[float] = None) -> Dict:
+        return self.submit_batch([email_text])[0].result(timeout)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"pending": self._pending, "max_pending": self.max_pending, **self.cache.stats()}
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+class BatchRun:
+    """Feed many (source, text) emails through a pool from a background thread.
+
+    At most `window` chunks are queued at once, so a large upload leaves room in the pool
+    for interactive requests. Results land in `results` by position as they finish.
+    """
+
+    def __init__(self, pool: ProcessorPool, emails: Sequence[Tuple[str, str]],
+                 chunk_size: int = 16, window: int = 2):
+        self.pool = pool
+        self.sources = [source for source, _ in emails]
+        self.results = {}
+        self.errors = {}
+        self.started = time.time()
+        self.finished = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._feed, args=([text for _, text in emails], chunk_size, window), daemon=True
+        )
+        self._thread.start()
+
+    def _feed(self, texts: List[str], chunk_size: int, window: int):
+        in_flight = deque()
+        for start in range(0, len(texts), chunk_size):
+            chunk = texts[start:start + chunk_size]
+            while len(in_flight) >= window:
+                wait(in_flight.popleft())
+            while not self._stop.is_set():
+                try:
+                    futures = self.pool.submit_batch(chunk)
+                    break
+                except PoolBusy:
+                    time.sleep(0.2)
+            if self._stop.is_set():
+                break
+            for index, future in enumerate(futures, start):
+                future.add_done_callback(partial(self._collect, index))
+            in_flight.append(futures)
+        for futures in in_flight:
+            wait(futures)
+        self.finished = time.time()
+
+    def _collect(self, index: int, future: Future):
+        if (error := future.exception()) is not None:
+            self.errors[index] = f"{type(error).__name__}: {error}"
+        else:
+            self.results[index] = future.result()
+
+    @property
+    def total(self) -> int:
+        return len(self.sources)
+
+    @property
+    def done(self) -> int:
+        return len(self.results) + len(self.errors)
+
+    @property
+    def running(self) -> bool:
+        # Done callbacks can still be running just after the feeder's final wait returns
+        return self.finished is None or (self.done < self.total and not self._stop.is_set())
+
+    def cancel(self):
+        """Stop submitting further chunks; emails already queued still finish"""
+        self._stop.set()
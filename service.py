@@ -0,0 +1,343 @@
+import argparse
+import asyncio
+import json
+import time
+from collections import defaultdict, deque
+from functools import partial
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from metrics import Histogram, histogram_lines
+from order_records import dumps
+from processor_pool import PoolBusy, ProcessorPool
+
+MAX_BODY_BYTES = 1 << 20
+READ_CHUNK_BYTES = 1 << 16
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+ROUTES = {"/healthz": "GET", "/metrics": "GET", "/extract": "POST", "/extract/bulk": "POST"}
+REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    413: "Payload Too Large", 429: "Too Many Requests", 500: "Internal Server Error",
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class MicroBatcher:
+    """Gathers concurrent extraction requests into pool batches.
+
+    The first email in a batch waits at most `window` seconds for company, so a batch is
+    dispatched when it holds `max_batch` emails or the window closes, whichever is first.
+    """
+
+    def __init__(self, pool: ProcessorPool, max_batch: int = 32, window: float = 0.01, max_queue: int = 256):
+        self.pool = pool
+        self.max_batch = max_batch
+        self.window = window
+        self.queue = asyncio.Queue(max_queue)
+        self.batch_sizes = Histogram(BATCH_BUCKETS)
+
+    def submit_nowait(self, email_text: str) -> asyncio.Future:
+        """Queue an email or raise asyncio.QueueFull, for callers that should get a 429"""
+        waiter = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((email_text, waiter))
+        return waiter
+
+    async def submit(self, email_text: str) -> asyncio.Future:
+        """Queue an email, waiting for room; bulk uploads are slowed down instead of rejected"""
+        waiter = asyncio.get_running_loop().create_future()
+        await self.queue.put((email_text, waiter))
+        return waiter
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch and (timeout := deadline - loop.time()) > 0:
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._dispatch(batch)
+
+    async def _dispatch(self, batch: List[Tuple[str, asyncio.Future]]):
+        texts = [email_text for email_text, _ in batch]
+        # A full pool holds the batcher back, so the intake queue fills and new requests get 429
+        while True:
+            try:
+                futures = self.pool.submit_batch(texts)
+                break
+            except PoolBusy:
+                await asyncio.sleep(self.window or 0.01)
+        self.batch_sizes.observe(len(batch))
+        for (_, waiter), future in zip(batch, futures):
+            asyncio.wrap_future(future).add_done_callback(partial(_relay, waiter))
+
+
+def _relay(waiter: asyncio.Future, done: asyncio.Future):
+    if waiter.cancelled():
+        return
+    if (error := done.exception()) is not None:
+        waiter.set_exception(error)
+    else:
+        waiter.set_result(done.result())
+
+
+def _chunk_size(line: bytes) -> int:
+    try:
+        return int(line.split(b";")[0], 16)
+    except ValueError:
+        raise HttpError(400, "Malformed chunked body")
+
+
+def _response(status: int, body: bytes, content_type: str = "application/json",
+              close: bool = False, extra: Optional[Dict[str, str]] = None) -> bytes:
+    headers = {"Content-Type": content_type, "Content-Length": str(len(body)), **(extra or {})}
+    if close:
+        headers["Connection"] = "close"
+    head = f"HTTP/1.1 {status} {REASONS[status]}\r\n" + "".join(f"{k}: {v}\r\n" for k, v in headers.items())
+    return head.encode() + b"\r\n" + body
+
+
+def _error_body(message: str) -> bytes:
+    return json.dumps({"error": message}).encode()
+
+
+class ExtractionService:
+    """Minimal HTTP/1.1 front end over a MicroBatcher, built on asyncio streams only"""
+
+    def __init__(self, pool: ProcessorPool, batcher: MicroBatcher, bulk_in_flight: int = 128):
+        self.pool = pool
+        self.batcher = batcher
+        self.bulk_in_flight = bulk_in_flight
+        self.requests = defaultdict(int)
+        self.latency = Histogram()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while (request := await self._read_head(reader)) is not None:
+                method, path, headers = request
+                start = time.perf_counter()
+                try:
+                    status, close = await self._route(method, path, headers, reader, writer)
+                except HttpError as e:
+                    # The body may be partly unread, so the connection cannot be reused
+                    status, close = e.status, True
+                    writer.write(_response(e.status, _error_body(str(e)), close=True))
+                label = path if path in ROUTES else "other"
+                self.requests[(label, status)] += 1
+                if label == "/extract":
+                    self.latency.observe(time.perf_counter() - start)
+                await writer.drain()
+                if close or headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_head(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str]]]:
+        if not (request_line := await reader.readline()):
+            return None
+        try:
+            method, target, _ = request_line.decode("latin-1").split()
+        except ValueError:
+            raise ConnectionError("malformed request line")
+        headers = {}
+        while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return method, target.split("?", 1)[0], headers
+
+    async def _body(self, reader: asyncio.StreamReader, headers: Dict[str, str]) -> AsyncIterator[bytes]:
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            while size := _chunk_size(await reader.readline()):
+                yield await reader.readexactly(size)
+                await reader.readline()
+            # Skip trailers up to the blank line that ends the body
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            return
+        if not (length := headers.get("content-length", "0")).isdigit():
+            raise HttpError(400, f"Invalid Content-Length {length!r}")
+        remaining = int(length)
+        while remaining > 0:
+            chunk = await reader.read(min(remaining, READ_CHUNK_BYTES))
+            if not chunk:
+                raise asyncio.IncompleteReadError(b"", remaining)
+            remaining -= len(chunk)
+            yield chunk
+
+    async def _route(self, method: str, path: str, headers: Dict[str, str],
+                     reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> Tuple[int, bool]:
+        if path not in ROUTES:
+            raise HttpError(404, f"No route for {path}")
+        if method != ROUTES[path]:
+            raise HttpError(405, f"{path} only accepts {ROUTES[path]}")
+        if path == "/healthz":
+            health = {"status": "ok", "queued": self.batcher.queue.qsize(), **self.pool.stats()}
+            writer.write(_response(200, json.dumps(health).encode()))
+        elif path == "/metrics":
+            writer.write(_response(200, self.prometheus().encode(), "text/plain; version=0.0.4"))
+        elif path == "/extract":
+            return await self._extract(headers, reader, writer), False
+        else:
+            return 200, await self._extract_bulk(headers, reader, writer)
+        return 200, False
+
+    async def _extract(self, headers: Dict[str, str], reader: asyncio.StreamReader,
+                       writer: asyncio.StreamWriter) -> int:
+        body = bytearray()
+        async for chunk in self._body(reader, headers):
+            body += chunk
+            if len(body) > MAX_BODY_BYTES:
+                raise HttpError(413, f"Email bodies are limited to {MAX_BODY_BYTES} bytes")
+        email_text = self._email_text(bytes(body), headers.get("content-type", ""))
+        try:
+            waiter = self.batcher.submit_nowait(email_text)
+        except asyncio.QueueFull:
+            writer.write(_response(429, _error_body("Extraction queue is full"), extra={"Retry-After": "1"}))
+            return 429
+        try:
+            order_data = await waiter
+        except Exception as e:
+            writer.write(_response(500, _error_body(f"{type(e).__name__}: {e}")))
+            return 500
+        writer.write(_response(200, dumps(order_data)))
+        return 200
+
+    @staticmethod
+    def _email_text(body: bytes, content_type: str) -> str:
+        if not content_type.startswith("application/json"):
+            return body.decode("utf-8", errors="replace")
+        try:
+            return json.loads(body)["email"]
+        except (ValueError, KeyError, TypeError):
+            raise HttpError(400, 'JSON requests must look like {"email": "..."}')
+
+    async def _extract_bulk(self, headers: Dict[str, str], reader: asyncio.StreamReader,
+                            writer: asyncio.StreamWriter) -> bool:
+        """JSON Lines in, JSON Lines out in input order, streamed as each result is ready.
+
+        Each input line is {"id": ..., "email": "..."}; each output line is {"id": ..., "order": {...}}
+        or {"id": ..., "error": "..."}. At most bulk_in_flight emails are outstanding per request.
+        A malformed body ends the stream with a final {"error": ...} line and closes the connection.
+        """
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nTransfer-Encoding: chunked\r\n\r\n")
+        in_flight = deque()
+
+        async def emit(item_id, waiter):
+            try:
+                line = dumps({"id": item_id, "order": await waiter})
+            except Exception as e:
+                line = dumps({"id": item_id, "error": f"{type(e).__name__}: {e}"})
+            writer.write(b"%x\r\n%s\n\r\n" % (len(line) + 1, line))
+            await writer.drain()
+
+        try:
+            await self._read_bulk(headers, reader, in_flight, emit)
+        except HttpError as e:
+            line = dumps({"error": str(e)})
+            writer.write(b"%x\r\n%s\n\r\n0\r\n\r\n" % (len(line) + 1, line))
+            return True
+        while in_flight:
+            await emit(*in_flight.popleft())
+        writer.write(b"0\r\n\r\n")
+        return False
+
+    async def _bulk_lines(self, headers: Dict[str, str], reader: asyncio.StreamReader) -> AsyncIterator[bytes]:
+        pending = b""
+        async for chunk in self._body(reader, headers):
+            *lines, pending = (pending + chunk).split(b"\n")
+            for line in lines:
+                yield line
+            if len(pending) > MAX_BODY_BYTES:
+                raise HttpError(413, f"Bulk lines are limited to {MAX_BODY_BYTES} bytes")
+        yield pending
+
+    async def _read_bulk(self, headers: Dict[str, str], reader: asyncio.StreamReader, in_flight: deque, emit):
+        line_number = 0
+        async for line in self._bulk_lines(headers, reader):
+            if not line.strip():
+                continue
+            line_number += 1
+            try:
+                item = json.loads(line)
+                item_id, email_text = item.get("id", line_number), item["email"]
+            except (ValueError, KeyError, TypeError, AttributeError):
+                waiter = asyncio.get_running_loop().create_future()
+                waiter.set_exception(ValueError(f'line {line_number} is not {{"id": ..., "email": ...}}'))
+                item_id = line_number
+            else:
+                waiter = await self.batcher.submit(email_text)
+            in_flight.append((item_id, waiter))
+            while len(in_flight) >= self.bulk_in_flight:
+                await emit(*in_flight.popleft())
+
+    def prometheus(self, prefix: str = "order_service") -> str:
+        lines = [f"# HELP {prefix}_http_requests_total HTTP requests by path and status",
+                 f"# TYPE {prefix}_http_requests_total counter"]
+        for (path, status), count in sorted(self.requests.items()):
+            lines.append(f'{prefix}_http_requests_total{{path="{path}",status="{status}"}} {count}')
+        lines += histogram_lines(f"{prefix}_extract_seconds", "Latency of /extract requests", {"": self.latency})
+        lines += histogram_lines(f"{prefix}_batch_size", "Emails per dispatched micro-batch",
+                                 {"": self.batcher.batch_sizes})
+        stats = self.pool.stats()
+        lines += [
+            f"# HELP {prefix}_queue_depth Emails waiting to be batched",
+            f"# TYPE {prefix}_queue_depth gauge",
+            f"{prefix}_queue_depth {self.batcher.queue.qsize()}",
+            f"# HELP {prefix}_pool_pending Emails dispatched to worker processes and not yet finished",
+            f"# TYPE {prefix}_pool_pending gauge",
+            f"{prefix}_pool_pending {stats['pending']}",
+            f"# HELP {prefix}_cache_lookups_total Memoized result lookups",
+            f"# TYPE {prefix}_cache_lookups_total counter",
+            f'{prefix}_cache_lookups_total{{result="hit"}} {stats["hits"]}',
+            f'{prefix}_cache_lookups_total{{result="miss"}} {stats["misses"]}',
+        ]
+        return "\n".join(lines) + "\n"
+
+
+async def serve(args):
+    pool = ProcessorPool(workers=args.workers, max_pending=args.max_batch * args.workers * 2,
+                         catalog_path=args.catalog, mode=args.mode)
+    batcher = MicroBatcher(pool, args.max_batch, args.batch_window_ms / 1000, args.max_queue)
+    service = ExtractionService(pool, batcher)
+    batch_task = asyncio.create_task(batcher.run())
+    server = await asyncio.start_server(service.handle, args.host, args.port)
+    from rich.console import Console
+    Console().print(f"Serving on http://{args.host}:{args.port} with {args.workers} workers", style="green")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        batch_task.cancel()
+        pool.shutdown(wait=False)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="HTTP service for email order extraction")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=2, help="Extraction processes, one OrderProcessor each")
+    parser.add_argument("--catalog", default="data/product_catalog.json")
+    parser.add_argument("--mode", choices=["full", "tiered"], default="full")
+    parser.add_argument("--max-batch", type=int, default=32, help="Most emails per micro-batch")
+    parser.add_argument("--batch-window-ms", type=float, default=10.0,
+                        help="Longest the first email of a batch waits for others")
+    parser.add_argument("--max-queue", type=int, default=256, help="Queued emails before /extract answers 429")
+    return parser.parse_args()
+
+
+def main():
+    try:
+        asyncio.run(serve(parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,13 @@
 import streamlit as st
-from order_processor import OrderProcessor
+from processor_pool import BatchRun, PoolBusy, ProcessorPool
+from ingest import iter_upload
+from order_records import dumps, line_items_csv
+from order_validation import REVIEW_REASONS, BatchValidation, PriceBook, validate_orders
 import pandas as pd
-import json
 from pathlib import Path
 import os
+import time
+from typing import Dict, List, Tuple
 from datetime import datetime
 
 # Set page config
@@ -32,18 +36,25 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# Initialize processor
+# Initialize the processor pool, shared by every session; workers pick up catalog edits in place
 @st.cache_resource
-def load_processor():
-    return OrderProcessor()
+def load_pool():
+    return ProcessorPool(workers=int(os.environ.get("ORDER_POOL_WORKERS", 2)))
 
-processor = load_processor()
+pool = load_pool()
+
+@st.cache_resource(max_entries=1)
+def load_prices(catalog_path: str, stamp: int) -> PriceBook:
+    return PriceBook.from_file(catalog_path)
+
+# Keyed on the catalog's mtime so totals follow catalog edits like the workers do
+prices = load_prices(pool.catalog_path, os.stat(pool.catalog_path).st_mtime_ns)
 
 # Sidebar
 st.sidebar.title("Input Options")
 input_method = st.sidebar.radio(
     "Select input method:",
-    ("Upload email file", "Paste email text", "Sample emails")
+    ("Upload email file", "Paste email text", "Sample emails", "Batch upload")
 )
 
 email_content = ""
@@ -63,6 +74,18 @@ elif input_method == "Paste email text":
         placeholder="Hi there,\n\nI'd like to order 2 t-shirts...\n\nShipping address:..."
     )
 
+elif input_method == "Batch upload":
+    uploaded_files = st.sidebar.file_uploader(
+        "Choose emails, .zip archives or .mbox files",
+        type=["txt", "eml", "mbox", "zip"],
+        accept_multiple_files=True
+    )
+    if uploaded_files and st.sidebar.button("Process batch", type="primary"):
+        if previous := st.session_state.get("batch"):
+            previous.cancel()
+        emails = [item for uploaded in uploaded_files for item in iter_upload(uploaded.name, uploaded.getvalue())]
+        st.session_state.batch = BatchRun(pool, emails)
+
 else:  # Sample emails
     sample_dir = Path("data/sample_emails")
     samples = [f for f in os.listdir(sample_dir) if f.endswith('.txt')]
@@ -74,13 +97,134 @@ else:  # Sample emails
         with open(sample_dir / selected_sample, 'r') as f:
             email_content = f.read()
 
+def validate_batch(run: BatchRun) -> Tuple[List[Tuple[int, Dict]], BatchValidation]:
+    """Finished (index, order) pairs whose needs_review comes from one vectorized validation pass"""
+    indices, orders = zip(*sorted(run.results.items())) if run.results else ((), ())
+    validation = validate_orders(orders, prices=prices)
+    return list(zip(indices, validation.annotate(orders))), validation
+
+def batch_table(run: BatchRun, finished: List[Tuple[int, Dict]], validation: BatchValidation) -> pd.DataFrame:
+    positions = {index: position for position, (index, _) in enumerate(finished)}
+    rows = []
+    for index, source in enumerate(run.sources):
+        if (position := positions.get(index)) is None:
+            if index in run.errors:
+                rows.append({"#": index, "Source": source, "Error": run.errors[index], "Needs review": True})
+            continue
+        order = finished[position][1]
+        confidences = [order['customer_name']['confidence'], order['shipping_address']['confidence']]
+        confidences += [product['confidence'] for product in order['products']]
+        rows.append({
+            "#": index,
+            "Source": source,
+            "Customer": order['customer_name']['value'],
+            "Items": int(validation.units[position]),
+            "Total": float(validation.order_total[position]),
+            "Needs review": bool(validation.needs_review[position]),
+            "Reasons": ", ".join(REVIEW_REASONS[reason] for reason in validation.order_reasons(position)),
+            "Priority": order['priority'],
+            "Delivery": order['delivery_date']['value'],
+            "Min confidence": min(confidences),
+            "Error": None,
+        })
+    return pd.DataFrame(rows, columns=["#", "Source", "Customer", "Items", "Total", "Needs review", "Reasons",
+                                       "Priority", "Delivery", "Min confidence", "Error"])
+
+def render_batch(run: BatchRun):
+    if run is None:
+        st.info("Upload emails, .zip archives or .mbox files in the sidebar and press Process batch")
+        return
+    elapsed = (run.finished or time.time()) - run.started
+    st.progress(run.done / run.total if run.total else 1.0,
+                text=f"{run.done} of {run.total} emails processed in {elapsed:.0f}s")
+    finished, validation = validate_batch(run)
+    table = batch_table(run, finished, validation)
+    if table.empty:
+        if run.running:
+            time.sleep(1)
+            st.rerun()
+        st.warning("No emails found in the upload")
+        return
+    
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Orders", len(table))
+    col2.metric("Needs review", int(table['Needs review'].sum()))
+    col3.metric("Batch total", f"${table['Total'].sum():,.2f}")
+    
+    col1, col2, col3, col4 = st.columns([1, 2, 1, 1])
+    review_only = col1.checkbox("Needs review only")
+    search = col2.text_input("Filter by source or customer")
+    sort_by = col3.selectbox("Sort by", ["#", "Total", "Min confidence", "Items", "Customer", "Source"])
+    descending = col4.checkbox("Descending")
+    
+    if review_only:
+        table = table[table['Needs review']]
+    if search:
+        matches = table['Source'].str.contains(search, case=False, regex=False)
+        matches |= table['Customer'].fillna("").str.contains(search, case=False, regex=False)
+        table = table[matches]
+    table = table.sort_values(sort_by, ascending=not descending, na_position="last")
+    
+    # Only one page of rows is ever sent to the browser
+    col1, col2 = st.columns([1, 3])
+    page_size = col1.selectbox("Rows per page", [25, 50, 100, 250], index=1)
+    pages = max(1, -(-len(table) // page_size))
+    page = col2.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1)
+    page_rows = table.iloc[(page - 1) * page_size:page * page_size]
+    st.dataframe(
+        page_rows,
+        column_config={
+            "Total": st.column_config.NumberColumn("Total", format="$%.2f"),
+            "Min confidence": st.column_config.ProgressColumn("Min confidence", format="%.2f", min_value=0, max_value=1),
+        },
+        hide_index=True,
+        use_container_width=True
+    )
+    
+    if not page_rows.empty:
+        labels = {f"#{index} {run.sources[index]}": index for index in page_rows['#']}
+        selected = labels[st.selectbox("Open order", list(labels))]
+        with st.expander("Order details"):
+            st.json(dict(finished).get(selected) or {"error": run.errors.get(selected)})
+    
+    if not run.running:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        col1, col2 = st.columns(2)
+        col1.download_button(
+            label="Download all orders (JSON Lines)",
+            data=b"\n".join(dumps({"source": run.sources[index], **order}) for index, order in finished),
+            file_name=f"orders_{timestamp}.jsonl",
+            mime="application/x-ndjson"
+        )
+        col2.download_button(
+            label="Download all line items (CSV)",
+            data=line_items_csv((index, order, run.sources[index]) for index, order in finished),
+            file_name=f"line_items_{timestamp}.csv",
+            mime="text/csv"
+        )
+    else:
+        # Poll for more results while the batch runs in the background
+        time.sleep(1)
+        st.rerun()
+
 # Main content
 st.title("✉️ Email-to-Order Processor")
 st.markdown("Extract structured order data from unstructured emails")
 
-if email_content:
+if input_method == "Batch upload":
+    render_batch(st.session_state.get("batch"))
+
+elif email_content:
     with st.spinner("Processing email..."):
-        order_data = processor.process_email(email_content)
+        try:
+            # Reruns of the same email are answered from the pool's memo
+            order_data = pool.process(email_content)
+        except PoolBusy:
+            st.warning("The processor is busy with other reviewers' emails, please try again in a moment")
+            st.stop()
+    # The same flag as the batch view, including the catalog checks, for the summary and exports
+    validation = validate_orders([order_data], prices=prices)
+    order_data = validation.annotate([order_data])[0]
     
     tab1, tab2, tab3 = st.tabs(["📊 Order Summary", "🔍 Detailed View", "📤 Export Data"])
     
@@ -120,7 +264,7 @@ if email_content:
         if order_data['products']:
             st.subheader("🛍️ Products Ordered")
             products_df = pd.DataFrame(order_data['products'])
-            products_df['total'] = products_df['quantity'] * products_df['price']
+            products_df['total'] = validation.line_total
             
             st.dataframe(
                 products_df.style.format({
@@ -145,13 +289,15 @@ if email_content:
                 use_container_width=True
             )
             
-            order_total = products_df['total'].sum()
+            order_total = validation.order_total[0]
             st.success(f"**Order Total: ${order_total:,.2f}**")
         else:
             st.error("No products identified in the email")
         
         if order_data['needs_review']:
             st.error("⚠️ **This order requires manual review**", icon="⚠️")
+            if reasons := validation.order_reasons(0):
+                st.caption(" · ".join(REVIEW_REASONS[reason] for reason in reasons))
             if st.button("Mark as Reviewed", type="primary"):
                 st.success("Order marked as reviewed")
     
@@ -178,7 +324,7 @@ if email_content:
             st.subheader("JSON Export")
             st.download_button(
                 label="Download as JSON",
-                data=json.dumps(order_data, indent=2),
+                data=dumps(order_data, pretty=True),
                 file_name=f"order_{timestamp}.json",
                 mime="application/json"
             )
@@ -186,11 +332,9 @@ if email_content:
         with col2:
             st.subheader("CSV Export")
             if order_data['products']:
-                products_df = pd.DataFrame(order_data['products'])
-                csv = products_df.to_csv(index=False)
                 st.download_button(
                     label="Download Products as CSV",
-                    data=csv,
+                    data=line_items_csv([(0, order_data, None)]),
                     file_name=f"products_{timestamp}.csv",
                     mime="text/csv"
                 )
@@ -0,0 +1,52 @@
+import json
+
+import pytest
+import spacy
+
+from order_processor import OrderProcessor
+
+CATALOG = {"products": [
+    {"sku": "TSHIRT-001", "name": "Cotton T-Shirt", "price": 19.99},
+    {"sku": "PANTS-101", "name": "Jeans", "price": 49.99},
+    {"sku": "HAT-303", "name": "Baseball Cap", "price": 24.99},
+]}
+
+
+@pytest.fixture
+def processor(tmp_path, monkeypatch):
+    # A blank English pipeline tokenizes like the real one, which is all the matcher needs
+    monkeypatch.setattr(spacy, "load", lambda name, **kwargs: spacy.blank("en"))
+    path = tmp_path / "catalog.json"
+    path.write_text(json.dumps(CATALOG))
+    return OrderProcessor(str(path))
+
+
+def rewrite(processor, products):
+    with open(processor.catalog_path, 'w') as f:
+        json.dump({"products": products}, f)
+
+
+def test_reload_reports_catalog_skus(processor):
+    products = [dict(product) for product in CATALOG["products"][1:]]
+    products[0]["price"] = 44.99
+    products.append({"sku": "Socks-404", "name": "Ankle Socks", "price": 9.99})
+    rewrite(processor, products)
+    assert processor.reload_catalog() == {
+        "version": 2, "added": ["Socks-404"], "removed": ["TSHIRT-001"], "changed": ["PANTS-101"],
+    }
+    assert processor.catalog_index.lookup("socks-404")["name"] == "Ankle Socks"
+    assert processor.catalog_index.lookup("TSHIRT-001") is None
+
+
+def test_unchanged_catalog_keeps_its_version(processor):
+    fingerprint = processor.fingerprint
+    assert processor.reload_catalog() == {"version": 1, "added": [], "removed": [], "changed": []}
+    assert processor.fingerprint == fingerprint
+
+
+def test_reload_updates_the_phrase_matcher(processor):
+    rewrite(processor, CATALOG["products"] + [{"sku": "JACKET-505", "name": "Rain Jacket", "price": 99.0}])
+    processor.reload_catalog()
+    doc = processor.nlp("Please send two rain jackets and a Rain Jacket")
+    spans = [doc[start:end].text for _, start, end in processor.product_matcher(doc)]
+    assert spans == ["Rain Jacket"]
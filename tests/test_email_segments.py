@@ -0,0 +1,109 @@
+import json
+
+import pytest
+import spacy
+
+from email_segments import segment_email
+from order_processor import OrderProcessor
+
+ORDER = """Please send:
+- 2 Cotton T-Shirt (TSHIRT-001)
+Ship to:
+1 Main St
+Town, CA 90210"""
+
+
+@pytest.fixture
+def processor(tmp_path, monkeypatch):
+    monkeypatch.setattr(spacy, "load", lambda name, **kwargs: spacy.blank("en"))
+    path = tmp_path / "catalog.json"
+    path.write_text(json.dumps({"products": [
+        {"sku": "TSHIRT-001", "name": "Cotton T-Shirt", "price": 19.99},
+        {"sku": "PANTS-101", "name": "Jeans", "price": 49.99},
+    ]}))
+    return OrderProcessor(str(path))
+
+
+def test_reply_history_is_quoted():
+    segments = segment_email(
+        "Make it 3 please.\n\nOn Mon, Mar 3, 2025 at 9:14 AM Jane <jane@acme.com> wrote:\n"
+        "> Please send 2 shirts\n> by March 15"
+    )
+    assert segments.body == "Make it 3 please."
+    assert segments.quoted.startswith("On Mon")
+    assert "March 15" not in segments.text
+
+
+def test_inline_quote_markers_are_quoted():
+    segments = segment_email("> old line\nNew line\n> another old line")
+    assert segments.text == "New line"
+    assert segments.quoted == "> old line\n> another old line"
+
+
+def test_outlook_reply_header_starts_the_history():
+    segments = segment_email(
+        "Confirmed.\n\nFrom: Jane Doe <jane@acme.com>\nSent: Monday, March 3, 2025 9:14 AM\n"
+        "To: Sales\nSubject: RE: PO 4471\n\n" + ORDER
+    )
+    assert segments.text == "Confirmed."
+    assert "TSHIRT-001" in segments.quoted
+
+
+@pytest.mark.parametrize("header", [
+    "---------- Forwarded message ---------\nFrom: Jane Doe <jane@acme.com>\nDate: Mon, Mar 3, 2025\nSubject: PO 4471",
+    "Begin forwarded message:\n\nFrom: Jane Doe <jane@acme.com>\nSubject: PO 4471\nDate: March 3, 2025",
+    "________________________________\nFrom: Jane Doe <jane@acme.com>\nSent: Monday, March 3, 2025\nSubject: FW: PO 4471",
+])
+def test_forwarded_message_stays_in_the_body(header):
+    segments = segment_email("Please process the order below.\n\n" + header + "\n\n" + ORDER)
+    assert segments.quoted == ""
+    assert "- 2 Cotton T-Shirt (TSHIRT-001)" in segments.body
+    assert "Town, CA 90210" in segments.body
+
+
+def test_reply_inside_a_forward_is_quoted():
+    segments = segment_email(
+        "FYI\n\n---------- Forwarded message ---------\nFrom: Jane <jane@acme.com>\n\n" + ORDER
+        + "\n\nOn Sun, Mar 2, 2025 Sam <sam@example.com> wrote:\n> Any orders this week?"
+    )
+    assert "Town, CA 90210" in segments.body
+    assert segments.quoted.startswith("On Sun")
+
+
+def test_signature_after_signoff():
+    segments = segment_email("Hi Sam,\n" + ORDER + "\n\nBest regards,\nJane Doe\nAcme Corp | (555) 123-4567")
+    assert segments.body.rstrip().endswith("Town, CA 90210")
+    assert segments.signature.startswith("Best regards,")
+    assert segments.greeting == (0, len("Hi Sam,"))
+
+
+def test_signature_delimiter():
+    segments = segment_email(ORDER + "\n-- \nJane Doe\nPurchasing")
+    assert segments.signature == "-- \nJane Doe\nPurchasing"
+    assert segments.body.rstrip().endswith("Town, CA 90210")
+
+
+def test_mid_body_thanks_is_not_a_signature():
+    segments = segment_email("Hi Sam,\nThanks!\nPlease send:\n- 2 Jeans (PANTS-101)\nShip to:\n1 Main St\nTown, CA 90210\nJane Doe")
+    assert segments.signature == ""
+    assert "- 2 Jeans (PANTS-101)" in segments.body
+    # Without a sign-off the last lines are still searched for the sender's name
+    assert segments.text[slice(*segments.signoff)].endswith("Jane Doe")
+
+
+def test_forwarded_order_is_extracted(processor):
+    order = processor.process_email(
+        "Please process the order below.\n\nThanks,\nMark\n\n---------- Forwarded message ---------\n"
+        "From: Jane Doe <jane@acme.com>\nSubject: PO 4471\n\n" + ORDER + "\n\nRegards,\nJane Doe"
+    )
+    assert [(p['sku'], p['quantity']) for p in order['products']] == [("TSHIRT-001", 2)]
+    assert order['shipping_address']['value'].startswith("1 Main St")
+
+
+def test_order_in_quoted_reply_is_used_when_the_new_part_has_none(processor):
+    email_text = "Please process the order below.\n\nOn Mon, Mar 3, 2025 Jane <jane@acme.com> wrote:\n" + "\n".join(
+        "> " + line for line in ORDER.split("\n")
+    )
+    for order in [processor.process_email(email_text), next(processor.process_batch([email_text]))]:
+        assert [(p['sku'], p['quantity']) for p in order['products']] == [("TSHIRT-001", 2)]
+        assert order['shipping_address']['value'].startswith("1 Main St")
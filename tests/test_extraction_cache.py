@@ -0,0 +1,144 @@
+import sqlite3
+from datetime import date
+
+import pytest
+import spacy
+
+import extraction_cache
+from extraction_cache import ExtractionCache, catalog_fingerprint, depends_on_today
+from order_processor import OrderProcessor
+
+ORDER = {"customer_name": {"value": "Jane Doe", "confidence": 0.9}, "products": [], "tiers": {}}
+DATED = {**ORDER, "tiers": {"delivery_date": "relative"}}
+
+
+class FakeDate:
+    day = date(2024, 3, 1)
+
+    @classmethod
+    def today(cls):
+        return cls.day
+
+
+@pytest.fixture
+def fake_date(monkeypatch):
+    monkeypatch.setattr(extraction_cache, "date", FakeDate)
+    FakeDate.day = date(2024, 3, 1)
+    return FakeDate
+
+
+def disk_rows(path):
+    with sqlite3.connect(path) as db:
+        return db.execute("SELECT fingerprint, day FROM results ORDER BY rowid").fetchall()
+
+
+def test_memory_lru_evicts_least_recently_used():
+    cache = ExtractionCache(max_entries=2)
+    cache.attach("a")
+    keys = [cache.key(text) for text in ("one", "two", "three")]
+    cache.put(keys[0], ORDER)
+    cache.put(keys[1], ORDER)
+    assert cache.get(keys[0]) == ORDER
+    cache.put(keys[2], ORDER)
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == ORDER
+    assert cache.stats()["entries"] == 2
+
+
+def test_key_ignores_transport_noise_but_not_fingerprint():
+    cache = ExtractionCache()
+    cache.attach("a")
+    key = cache.key("Hello\r\nWorld  \r\n")
+    assert key == cache.key("Hello\nWorld")
+    cache.attach("b")
+    assert key != cache.key("Hello\nWorld")
+
+
+def test_results_survive_reopening_the_database(tmp_path, fake_date):
+    path = str(tmp_path / "cache.db")
+    cache = ExtractionCache(db_path=path)
+    cache.attach("a")
+    cache.put(cache.key("email"), ORDER)
+    cache.close()
+
+    reopened = ExtractionCache(db_path=path)
+    reopened.attach("a")
+    assert reopened.get(reopened.key("email")) == ORDER
+    assert reopened.stats()["disk_hits"] == 1
+
+
+def test_only_results_resolved_against_today_expire(tmp_path, fake_date):
+    path = str(tmp_path / "cache.db")
+    cache = ExtractionCache(db_path=path)
+    cache.attach("a")
+    cache.put(cache.key("ship next Friday"), DATED)
+    cache.put(cache.key("ship March 3, 2024"), ORDER)
+    assert disk_rows(path) == [("a", "2024-03-01"), ("a", None)]
+    fake_date.day = date(2024, 3, 2)
+    assert cache.get(cache.key("ship next Friday")) is None
+    assert cache.get(cache.key("ship March 3, 2024")) == ORDER
+    # Dated rows from earlier days are pruned on the first write of a new day
+    cache.put(cache.key("other"), ORDER)
+    assert disk_rows(path) == [("a", None), ("a", None)]
+    reopened = ExtractionCache(db_path=path)
+    reopened.attach("a")
+    assert reopened.get(reopened.key("ship March 3, 2024")) == ORDER
+
+
+def test_disk_table_is_bounded(tmp_path, fake_date):
+    path = str(tmp_path / "cache.db")
+    cache = ExtractionCache(max_entries=1, db_path=path, max_disk_entries=10)
+    cache.attach("a")
+    for i in range(25):
+        cache.put(cache.key(f"email {i}"), ORDER)
+    assert len(disk_rows(path)) <= 10
+    assert cache.get(cache.key("email 24")) == ORDER
+    assert cache.get(cache.key("email 0")) is None
+
+
+def test_attach_only_drops_its_own_rows(tmp_path, fake_date):
+    path = str(tmp_path / "cache.db")
+    first, second = ExtractionCache(db_path=path), ExtractionCache(db_path=path)
+    first.attach("a")
+    second.attach("b")
+    first.put(first.key("email"), ORDER)
+    second.put(second.key("email"), ORDER)
+    # Attaching the same file with other settings leaves the first processor's rows alone
+    ExtractionCache(db_path=path).attach("c")
+    assert first.get(first.key("email")) == ORDER
+    # A catalog reload replaces only the reloading cache's previous rows
+    second.attach("b2")
+    assert [fingerprint for fingerprint, _ in disk_rows(path)] == ["a"]
+
+
+@pytest.mark.parametrize("columns", [
+    "key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, result TEXT NOT NULL",
+    "key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, day TEXT NOT NULL, result TEXT NOT NULL",
+])
+def test_databases_from_older_layouts_are_rebuilt(tmp_path, fake_date, columns):
+    path = str(tmp_path / "cache.db")
+    with sqlite3.connect(path) as db:
+        db.execute(f"CREATE TABLE results ({columns})")
+    cache = ExtractionCache(db_path=path)
+    cache.attach("a")
+    cache.put(cache.key("email"), DATED)
+    cache.put(cache.key("other"), ORDER)
+    assert disk_rows(path) == [("a", "2024-03-01"), ("a", None)]
+
+
+def test_catalog_fingerprint_tracks_catalog_and_settings():
+    catalog = {"products": [{"sku": "HAT-303", "name": "Baseball Cap", "price": 24.99}]}
+    assert catalog_fingerprint(catalog, "full") == catalog_fingerprint(dict(catalog), "full")
+    assert catalog_fingerprint(catalog, "full") != catalog_fingerprint(catalog, "tiered")
+    assert catalog_fingerprint(catalog, "full") != catalog_fingerprint({"products": []}, "full")
+
+
+def test_only_dates_resolved_against_today_are_dated(tmp_path, monkeypatch):
+    monkeypatch.setattr(spacy, "load", lambda name, **kwargs: spacy.blank("en"))
+    path = tmp_path / "catalog.json"
+    path.write_text('{"products": [{"sku": "HAT-303", "name": "Baseball Cap", "price": 24.99}]}')
+    processor = OrderProcessor(str(path))
+    assert depends_on_today(processor.process_email("Please send 2 HAT-303.\nNeeded by March 15"))
+    assert depends_on_today(processor.process_email("Please send 2 HAT-303.\nWe need it next Friday"))
+    assert not depends_on_today(processor.process_email("Please send 2 HAT-303.\nNeeded by March 15, 2031"))
+    assert not depends_on_today(processor.process_email("Please send 2 HAT-303."))
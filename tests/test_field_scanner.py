@@ -0,0 +1,76 @@
+from field_scanner import FieldScanner
+from order_processor import DATE_TRIGGERS, EMAIL_PATTERN, MONTH_DAY_PATTERN, PHONE_PATTERN
+
+
+def make_scanner(address_keywords=("ship to", "deliver to", "mail to", "address", "send to"),
+                 priority_keywords=("urgent", "immediate", "asap", "time is critical", "rush")):
+    """The rules OrderProcessor._create_field_scanner registers"""
+    scanner = FieldScanner()
+    scanner.add_keywords("address", address_keywords)
+    for rule, keywords, _ in DATE_TRIGGERS:
+        scanner.add_keywords(rule, keywords)
+    scanner.add_pattern("date_month", MONTH_DAY_PATTERN)
+    scanner.add_keywords("next_friday", ["next friday"])
+    scanner.add_keywords("instructions", ["special instructions"])
+    scanner.add_keywords("priority", priority_keywords)
+    scanner.add_pattern("email", EMAIL_PATTERN)
+    scanner.add_pattern("phone", PHONE_PATTERN)
+    return scanner
+
+
+def test_email_starting_with_keyword_is_not_truncated():
+    text = "Contact Byron.Smith@acme.com or rush.orders@acme.com"
+    hits = make_scanner().scan(text).to_dict()
+    assert [text[start:end] for start, end in hits["email"]] == ["Byron.Smith@acme.com", "rush.orders@acme.com"]
+    assert hits["date_by"] == [(8, 10)]
+    assert hits["priority"] == [(32, 36)]
+
+
+def test_pattern_hits_do_not_overlap():
+    hits = make_scanner().scan("Call (555) 123-4567, mail jane.doe@example.com, due March 14").to_dict()
+    assert len(hits["email"]) == 1
+    assert len(hits["phone"]) == 1
+    assert len(hits["date_month"]) == 1
+
+
+def test_overlapping_keywords_from_other_rules():
+    text = "Please deliver by: May 3"
+    hits = make_scanner(address_keywords=["deliver"]).scan(text).to_dict()
+    assert hits["address"] == [(7, 14)]
+    assert hits["date_label"] == [(7, 17)]
+    assert hits["date_by"] == [(15, 17)]
+
+
+def test_prefix_keywords_of_one_rule_are_all_reported():
+    text = "Deliver to: 1 Main St"
+    hits = make_scanner(address_keywords=["deliver", "deliver to"]).scan(text).to_dict()
+    assert sorted(hits["address"]) == [(0, 7), (0, 10)]
+
+
+def test_keywords_are_case_insensitive_and_in_text_order():
+    text = "URGENT: needed by June 1. Also urgent."
+    hits = make_scanner().scan(text).to_dict()
+    assert [text[start:end].lower() for start, end in hits["priority"]] == ["urgent", "urgent"]
+    assert hits["date_by"] == [(8, 17), (15, 17)]
+
+
+def test_no_rules_matches_nothing():
+    assert FieldScanner().scan("anything at all").to_dict() == {}
+
+
+def test_hits_stop_at_the_end_offset():
+    text = "Rush order.\nShip to: 1 Main St\n\nRegards,\nJane, rush desk"
+    hits = make_scanner().scan(text)
+    assert hits.first("priority") == (0, 4)
+    assert list(hits.iter("priority", end=text.index("Regards"))) == [(0, 4)]
+    assert hits.first("address", end=5) is None
+    assert hits.first("instructions") is None
+
+
+def test_offsets_survive_characters_that_lowercase_to_two():
+    text = "\u0130stanbul office: URGENT, ship to HQ"
+    hits = make_scanner().scan(text)
+    start, end = hits.first("priority")
+    assert text[start:end] == "URGENT"
+    start, end = hits.first("address")
+    assert text[start:end] == "ship to"
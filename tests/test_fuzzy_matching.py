@@ -0,0 +1,73 @@
+import json
+
+import spacy
+
+from catalog_index import CatalogIndex
+from line_grammar import LineGrammar
+from order_processor import OrderProcessor
+
+PRODUCTS = [
+    {"sku": "SHOES-000123", "name": "Running Shoes", "price": 89.99},
+    {"sku": "SHOES-000124", "name": "Trail Boots", "price": 129.99},
+    {"sku": "HAT-303", "name": "Baseball Cap", "price": 24.99, "aliases": ["ball cap"]},
+]
+
+
+def match(line: str):
+    """_match_product_fuzzy for one product line, without loading a spaCy pipeline"""
+    processor = OrderProcessor.__new__(OrderProcessor)
+    processor.fuzzy_threshold = 0.8
+    processor.metrics = None
+    product, confidence = processor._match_product_fuzzy(LineGrammar().classify(line), CatalogIndex(PRODUCTS))
+    return (product or {}).get('sku'), confidence
+
+
+def test_neighbouring_sku_with_other_name_is_rejected():
+    assert match("- 2 Running Shoes (SHOES-000125)") == ("SHOES-000123", 0.9)
+    assert match("- 2 Leather Sandals (SHOES-000125)") == (None, 0.0)
+
+
+def test_sku_typo_is_accepted_when_the_name_agrees():
+    sku, confidence = match("- 2 Trail Bots (SHOES-00124)")
+    assert sku == "SHOES-000124"
+    assert 0.8 <= confidence < 1.0
+
+
+def test_name_typo_without_a_known_sku():
+    assert match("- 1 Basebal Cap (CAP-1)")[0] == "HAT-303"
+
+
+def test_name_matches_checks_aliases():
+    index = CatalogIndex(PRODUCTS)
+    assert index.name_matches("Ball Cap", PRODUCTS[2])
+    assert not index.name_matches("Running Shoes", PRODUCTS[2])
+
+
+def test_fuzzy_orders_go_to_review():
+    from order_validation import ValidationRules, review_reasons, validate_orders
+    order = {
+        "customer_name": {"value": "Jane Doe", "confidence": 0.9},
+        "products": [{"sku": "HAT-303", "name": "Baseball Cap", "quantity": 1, "price": 24.99, "confidence": 0.86}],
+        "shipping_address": {"value": "1 Main St\nTown", "confidence": 0.9},
+        "tiers": {"products": "fuzzy"},
+    }
+    # An exact name next to an unknown SKU, or a single typo, is trusted by default
+    assert review_reasons(order, ValidationRules()) == []
+    order['products'][0]['confidence'] = 0.79
+    assert review_reasons(order, ValidationRules()) == ["fuzzy_match"]
+    assert validate_orders([order]).reasons["fuzzy_match"].tolist() == [True]
+    assert review_reasons(order, ValidationRules(min_fuzzy_confidence=None)) == []
+    order['tiers'] = {"products": "regex"}
+    assert review_reasons(order, ValidationRules()) == []
+
+
+def test_free_text_typos(tmp_path, monkeypatch):
+    monkeypatch.setattr(spacy, "load", lambda name, **kwargs: spacy.blank("en"))
+    path = tmp_path / "catalog.json"
+    path.write_text(json.dumps({"products": PRODUCTS}))
+    processor = OrderProcessor(str(path))
+    order = processor.process_email("Hi,\nPlease send 2 Runing Shoes and a Basebal Cap.\n\nThanks,\nJane")
+    assert [(p['sku'], p['quantity']) for p in order['products']] == [("SHOES-000123", 2), ("HAT-303", 1)]
+    assert order['tiers']['products'] == "fuzzy"
+    # Words one typo away from a short name are not products
+    assert processor.process_email("Hi,\nIt means a lot, send the usual.\n\nThanks,\nJane")['products'] == []
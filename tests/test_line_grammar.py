@@ -0,0 +1,65 @@
+import pytest
+
+from line_grammar import LineGrammar, LineMatch
+
+
+@pytest.fixture
+def grammar():
+    return LineGrammar()
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("ITEM 1: Cotton T-Shirt (TSHIRT-001) - Qty: 2", ("item", "2", "Cotton T-Shirt", "TSHIRT-001")),
+    ("ITEM 2: Jeans (PANTS-101)", ("item", None, "Jeans", "PANTS-101")),
+    ("3 pairs of Ankle Socks (SOCKS-404)", ("pairs", "3", "Ankle Socks", "SOCKS-404")),
+    ("- 1 pair of Running Shoes (SHOES-202)", ("pairs", "1", "Running Shoes", "SHOES-202")),
+    ("- 2 Cotton T-Shirt (TSHIRT-001)", ("bullet", "2", "Cotton T-Shirt", "TSHIRT-001")),
+    ("1. 4 x Baseball Cap (HAT-303)", ("numbered", "4", "Baseball Cap", "HAT-303")),
+    ("  5 Jeans (PANTS-101)", ("bare", "5", "Jeans", "PANTS-101")),
+    ("Quantity: 7", ("qty", "7", None, None)),
+    ("Shirts, qty: 3", ("qty", "3", None, None)),
+])
+def test_each_format(grammar, line, expected):
+    match = grammar.classify(line)
+    assert match[:4] == expected
+    if match.name is not None:
+        assert line[slice(*match.name_span)] == match.name
+    else:
+        assert match.name_span is None
+
+
+def test_bulleted_pairs_are_not_read_as_a_bullet(grammar):
+    match = grammar.classify("- 3 pairs of Ankle Socks (SOCKS-404)")
+    assert (match.kind, match.qty, match.name) == ("pairs", "3", "Ankle Socks")
+
+
+@pytest.mark.parametrize("line", ["Please send the usual", "Ship to 42 Main St", ""])
+def test_non_product_lines(grammar, line):
+    assert grammar.classify(line) is None
+
+
+def test_register_before_takes_priority(grammar):
+    grammar.register("dozen", r'(?P<qty>\d+)\s+dozen\s+(?P<name>.+?)\s*\((?P<sku>[^)]+)\)', before="bare")
+    assert [kind for kind, _ in grammar.formats][-3:] == ["dozen", "bare", "qty"]
+    assert grammar.classify("2 dozen Baseball Cap (HAT-303)") == LineMatch(
+        "dozen", "2", "Baseball Cap", "HAT-303", (8, 20)
+    )
+    # Formats ahead of it still win
+    assert grammar.classify("- 2 dozen Baseball Cap (HAT-303)").kind == "bullet"
+
+
+def test_register_appends_by_default(grammar):
+    grammar.register("each", r'(?P<qty>\d+)\s+each')
+    assert grammar.formats[-1][0] == "each"
+    # "Qty:" lines are still matched first
+    assert grammar.classify("qty: 4").kind == "qty"
+    assert grammar.classify("4 each").qty == "4"
+
+
+def test_register_rejects_duplicates_and_unknown_anchors(grammar):
+    formats = list(grammar.formats)
+    with pytest.raises(ValueError, match="already registered"):
+        grammar.register("bullet", r'(?P<qty>\d+)')
+    with pytest.raises(ValueError):
+        grammar.register("dozen", r'(?P<qty>\d+)\s+dozen', before="missing")
+    assert grammar.formats == formats
@@ -0,0 +1,81 @@
+import csv
+
+import pytest
+
+from order_records import ITEM_COLUMNS, ORDER_COLUMNS, BatchWriter, OrderRecord, dumps, line_items_csv, loads
+
+ORDER = {
+    "customer_name": {"value": "Jane Doe", "confidence": 0.9},
+    "products": [
+        {"sku": "TSHIRT-001", "name": "Cotton T-Shirt", "quantity": 3, "price": 19.99, "confidence": 0.95},
+        {"sku": "HAT-303", "name": "Baseball Cap", "quantity": 1, "price": 24.99, "confidence": 0.95},
+    ],
+    "shipping_address": {"value": "1 Main St\nTown", "confidence": 0.9},
+    "delivery_date": {"value": "2024-03-01", "confidence": 0.9},
+    "special_instructions": ["Leave at the door"],
+    "priority": "urgent",
+    "contact": {"email": "jane@example.com"},
+    "needs_review": False,
+    "tiers": {"products": "regex"},
+}
+
+
+def test_record_round_trip():
+    record = OrderRecord.from_dict(ORDER)
+    assert record.to_dict() == ORDER
+    assert record.total == pytest.approx(84.96)
+    assert loads(dumps(record)) == ORDER
+    assert loads(dumps(ORDER, pretty=True)) == ORDER
+
+
+def test_line_items_csv_keeps_sources():
+    rows = list(csv.DictReader(line_items_csv([(4, ORDER, "inbox/a.eml"), (7, ORDER, None)]).splitlines()))
+    assert list(rows[0]) == ITEM_COLUMNS
+    assert [(row["order_id"], row["source"], row["sku"]) for row in rows] == [
+        ("4", "inbox/a.eml", "TSHIRT-001"), ("4", "inbox/a.eml", "HAT-303"),
+        ("7", "", "TSHIRT-001"), ("7", "", "HAT-303"),
+    ]
+    assert rows[0]["line_total"] == "59.97"
+
+
+def test_batch_writer_jsonl(tmp_path):
+    path = tmp_path / "orders.jsonl"
+    with BatchWriter(str(path), chunk_size=2) as writer:
+        for i in range(5):
+            writer.write(ORDER, source=f"{i}.txt")
+    lines = [loads(line) for line in path.read_bytes().splitlines()]
+    assert [line["source"] for line in lines] == [f"{i}.txt" for i in range(5)]
+    assert (writer.orders, writer.items) == (5, 10)
+
+
+def test_batch_writer_csv(tmp_path):
+    with BatchWriter(str(tmp_path / "orders.csv"), chunk_size=2) as writer:
+        for i in range(3):
+            writer.write(OrderRecord.from_dict(ORDER), source=f"{i}.txt")
+    orders_path, items_path = writer.outputs
+    with open(orders_path, newline='') as f:
+        orders = list(csv.DictReader(f))
+    with open(items_path, newline='') as f:
+        items = list(csv.DictReader(f))
+    assert list(orders[0]) == ORDER_COLUMNS
+    assert [(row["order_id"], row["source"], row["order_total"]) for row in orders] == [
+        ("0", "0.txt", "84.96"), ("1", "1.txt", "84.96"), ("2", "2.txt", "84.96"),
+    ]
+    assert [row["source"] for row in items] == ["0.txt", "0.txt", "1.txt", "1.txt", "2.txt", "2.txt"]
+
+
+def test_batch_writer_parquet(tmp_path):
+    # A pyarrow built for another NumPy raises ImportError rather than ModuleNotFoundError
+    pq = pytest.importorskip("pyarrow.parquet", exc_type=ImportError)
+    with BatchWriter(str(tmp_path / "orders.parquet"), chunk_size=2) as writer:
+        for i in range(3):
+            writer.write(ORDER, source=f"{i}.txt")
+    orders = pq.read_table(writer.outputs[0]).to_pylist()
+    items = pq.read_table(writer.outputs[1]).to_pylist()
+    assert [row["order_total"] for row in orders] == [84.96] * 3
+    assert [row["source"] for row in items] == ["0.txt", "0.txt", "1.txt", "1.txt", "2.txt", "2.txt"]
+
+
+def test_unknown_output_format(tmp_path):
+    with pytest.raises(ValueError, match="Unsupported output"):
+        BatchWriter(str(tmp_path / "orders.xlsx"))
@@ -0,0 +1,117 @@
+import json
+
+import numpy as np
+import pytest
+
+from order_records import OrderRecord
+from order_validation import (PriceBook, QuantityHistory, ValidationRules, review_reasons,
+                              validate_orders)
+
+CATALOG = [
+    {"sku": "TSHIRT-001", "name": "Cotton T-Shirt", "price": 19.99},
+    {"sku": "PANTS-101", "name": "Jeans", "price": 49.99},
+    {"sku": "HAT-303", "name": "Baseball Cap", "price": 24.99},
+]
+
+
+def line(sku, quantity, price, confidence=0.95):
+    return {"sku": sku, "name": sku, "quantity": quantity, "price": price, "confidence": confidence}
+
+
+def order(products, customer="Jane Doe", customer_confidence=0.9, address="1 Main St\nTown"):
+    return {
+        "customer_name": {"value": customer, "confidence": customer_confidence},
+        "products": products,
+        "shipping_address": {"value": address, "confidence": 0.9 if address else 0.0},
+        "delivery_date": {"value": None, "confidence": 0.0},
+        "special_instructions": [],
+        "priority": "normal",
+        "contact": {},
+        "needs_review": False,
+        "tiers": {},
+    }
+
+
+ORDERS = [
+    order([line("TSHIRT-001", 3, 19.99), line("PANTS-101", 1, 49.99)]),
+    order([], customer=None),
+    order([line("HAT-303", 1001, 24.99)], address=None),
+    order([line("HAT-303", 0, 24.99)], customer_confidence=0.4),
+    order([line("TSHIRT-001", 2, 19.99)]),
+]
+
+
+def test_totals_and_units():
+    validation = validate_orders(ORDERS)
+    np.testing.assert_allclose(validation.order_total, [109.96, 0.0, 25014.99, 0.0, 39.98])
+    assert validation.units.tolist() == [4, 0, 1001, 0, 2]
+    np.testing.assert_allclose(validation.line_totals(0), [59.97, 49.99])
+
+
+def test_batch_flags_match_single_order_rules():
+    rules = ValidationRules()
+    validation = validate_orders(ORDERS, rules)
+    for index, single in enumerate(ORDERS):
+        assert validation.order_reasons(index) == review_reasons(single, rules)
+    assert validation.needs_review.tolist() == [False, True, True, True, False]
+    assert validation.order_reasons(2) == ["shipping_address", "quantity_range"]
+
+
+def test_rules_are_configurable():
+    rules = ValidationRules(max_quantity=2, require_shipping_address=False, max_order_total=100.0)
+    validation = validate_orders(ORDERS, rules)
+    assert validation.order_reasons(0) == ["quantity_range", "order_total"]
+    assert validation.order_reasons(2) == ["quantity_range", "order_total"]
+    assert not validation.needs_review[4]
+
+
+def test_prices_come_from_the_current_catalog():
+    catalog = [dict(product) for product in CATALOG if product["sku"] != "PANTS-101"]
+    catalog[0]["price"] = 21.99
+    validation = validate_orders(ORDERS, prices=PriceBook(catalog))
+    assert validation.order_reasons(0) == ["unknown_sku", "price_changed"]
+    # Lines still in the catalog are repriced; dropped SKUs keep their extracted price
+    np.testing.assert_allclose(validation.line_totals(0), [65.97, 49.99])
+    assert validation.order_reasons(4) == ["price_changed"]
+    assert not validate_orders(ORDERS[4:], prices=PriceBook(CATALOG)).needs_review[0]
+
+
+def test_quantity_outliers_against_history():
+    history = QuantityHistory(["TSHIRT-001"] * 30 + ["PANTS-101"] * 5, [2, 3, 4] * 10 + [1] * 5)
+    orders = [order([line("TSHIRT-001", quantity, 19.99)]) for quantity in (3, 6, 40)]
+    orders.append(order([line("PANTS-101", 50, 49.99)]))
+    validation = validate_orders(orders, history=history)
+    assert validation.reasons["quantity_outlier"].tolist() == [False, False, True, False]
+    # PANTS-101 has fewer than min_history past lines, so it is never scored
+    assert validation.quantity_score[3] == 0
+
+
+def test_group_medians_and_mads():
+    history = QuantityHistory(["a", "b", "a", "b", "a"], [1, 10, 3, 20, 100])
+    assert history.medians.tolist() == [3.0, 15.0]
+    assert history.mads.tolist() == [2.0, 5.0]
+    assert history.counts.tolist() == [3, 2]
+
+
+def test_annotate_carries_the_batch_flag():
+    orders = [order([line("TSHIRT-001", 2, 18.99)])]
+    validation = validate_orders(orders, prices=PriceBook(CATALOG))
+    [annotated] = validation.annotate(orders)
+    assert annotated["needs_review"] is True
+    assert orders[0]["needs_review"] is False
+
+
+def test_accepts_records_and_empty_batches():
+    records = [OrderRecord.from_dict(single) for single in ORDERS]
+    assert validate_orders(records).needs_review.tolist() == validate_orders(ORDERS).needs_review.tolist()
+    empty = validate_orders([], prices=PriceBook(CATALOG), history=QuantityHistory([], []))
+    assert empty.summary() == {"orders": 0, "needs_review": 0, "total": 0.0, "reasons": {}}
+
+
+def test_rules_load_rejects_unknown_keys(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"max_quantity": 10}))
+    assert ValidationRules.load(str(path)).max_quantity == 10
+    path.write_text(json.dumps({"max_qty": 10}))
+    with pytest.raises(ValueError, match="max_qty"):
+        ValidationRules.load(str(path))
@@ -0,0 +1,153 @@
+import asyncio
+import json
+import threading
+from concurrent.futures import Future
+
+import service
+from service import ExtractionService, MicroBatcher
+
+
+class StubPool:
+    """Echoes each email back as its order; later emails in a batch finish first"""
+
+    def __init__(self):
+        self.batches = []
+
+    def submit_batch(self, texts):
+        self.batches.append(list(texts))
+        futures = []
+        for i, text in enumerate(texts):
+            future = Future()
+            if text.startswith("fail"):
+                settle, outcome = future.set_exception, ValueError("unreadable email")
+            else:
+                settle, outcome = future.set_result, {"email": text}
+            threading.Timer(0.005 * (len(texts) - i), settle, args=(outcome,)).start()
+            futures.append(future)
+        return futures
+
+    def stats(self):
+        return {"pending": 0, "hits": 0, "misses": 0}
+
+
+def run_service(scenario, run_batcher=True, **batcher_options):
+    """Serve a StubPool on an ephemeral localhost port and run `scenario(port, service)` against it"""
+    async def main():
+        batcher = MicroBatcher(StubPool(), **batcher_options)
+        extraction = ExtractionService(batcher.pool, batcher)
+        batch_task = asyncio.create_task(batcher.run()) if run_batcher else None
+        server = await asyncio.start_server(extraction.handle, "127.0.0.1", 0)
+        try:
+            return await scenario(server.sockets[0].getsockname()[1], extraction)
+        finally:
+            if batch_task:
+                batch_task.cancel()
+            server.close()
+            await server.wait_closed()
+
+    return asyncio.run(main())
+
+
+async def request(port, method, path, body=b"", headers=None):
+    """(status, headers, body) of one request on its own connection"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    head = {"Content-Length": str(len(body)), "Connection": "close", **(headers or {})}
+    writer.write(f"{method} {path} HTTP/1.1\r\n".encode()
+                 + "".join(f"{name}: {value}\r\n" for name, value in head.items()).encode() + b"\r\n" + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    status_line, *header_lines = head.decode().split("\r\n")
+    response_headers = dict(line.split(": ", 1) for line in header_lines)
+    if response_headers.get("Transfer-Encoding") == "chunked":
+        payload = dechunk(payload)
+    return int(status_line.split()[1]), response_headers, payload
+
+
+def dechunk(payload: bytes) -> bytes:
+    body = b""
+    while True:
+        size, _, payload = payload.partition(b"\r\n")
+        if not (size := int(size, 16)):
+            return body
+        body += payload[:size]
+        payload = payload[size + 2:]
+
+
+def test_extract_plain_and_json():
+    async def scenario(port, _):
+        plain = await request(port, "POST", "/extract", b"Please send 2 hats")
+        as_json = await request(port, "POST", "/extract", json.dumps({"email": "Ship today"}).encode(),
+                                {"Content-Type": "application/json"})
+        return plain, as_json
+
+    (status, _, body), (json_status, _, json_body) = run_service(scenario)
+    assert (status, json.loads(body)) == (200, {"email": "Please send 2 hats"})
+    assert (json_status, json.loads(json_body)) == (200, {"email": "Ship today"})
+
+
+def test_extract_errors():
+    async def scenario(port, _):
+        return [
+            await request(port, "POST", "/extract", b"fail me"),
+            await request(port, "POST", "/extract", b"{}", {"Content-Type": "application/json"}),
+            await request(port, "GET", "/extract"),
+            await request(port, "GET", "/nowhere"),
+        ]
+
+    assert [status for status, _, _ in run_service(scenario)] == [500, 400, 405, 404]
+
+
+def test_oversized_body_is_rejected(monkeypatch):
+    monkeypatch.setattr(service, "MAX_BODY_BYTES", 64)
+
+    async def scenario(port, _):
+        return await request(port, "POST", "/extract", b"x" * 65)
+
+    status, headers, body = run_service(scenario)
+    assert status == 413
+    assert headers["Connection"] == "close"
+    assert "64 bytes" in json.loads(body)["error"]
+
+
+def test_full_queue_answers_429():
+    async def scenario(port, extraction):
+        # Nothing drains the queue, so one waiting email fills it
+        extraction.batcher.submit_nowait("waiting")
+        return await request(port, "POST", "/extract", b"Please send 2 hats")
+
+    status, headers, _ = run_service(scenario, run_batcher=False, max_queue=1)
+    assert status == 429
+    assert headers["Retry-After"] == "1"
+
+
+def test_bulk_keeps_input_order_and_reports_errors():
+    lines = [{"id": f"m{i}", "email": f"email {i}"} for i in range(10)]
+    lines.insert(3, {"id": "bad", "email": "fail this one"})
+    body = b"\n".join(json.dumps(line).encode() for line in lines) + b"\nnot json\n"
+
+    async def scenario(port, extraction):
+        response = await request(port, "POST", "/extract/bulk", body)
+        return response, extraction.batcher.pool.batches
+
+    (status, _, payload), batches = run_service(scenario, max_batch=4, window=0.05)
+    results = [json.loads(line) for line in payload.decode().splitlines()]
+    assert status == 200
+    assert [result["id"] for result in results] == [line["id"] for line in lines] + [12]
+    assert results[0] == {"id": "m0", "order": {"email": "email 0"}}
+    assert results[3]["error"] == "ValueError: unreadable email"
+    assert "not {" in results[-1]["error"]
+    # Emails were extracted in micro-batches rather than one at a time
+    assert max(len(batch) for batch in batches) > 1
+
+
+def test_healthz_and_metrics():
+    async def scenario(port, _):
+        await request(port, "POST", "/extract", b"Please send 2 hats")
+        return await request(port, "GET", "/healthz"), await request(port, "GET", "/metrics")
+
+    (health_status, _, health), (metrics_status, _, metrics) = run_service(scenario)
+    assert health_status == metrics_status == 200
+    assert json.loads(health)["status"] == "ok"
+    assert 'order_service_http_requests_total{path="/extract",status="200"} 1' in metrics.decode()
@@ -0,0 +1,122 @@
+import time
+
+import pytest
+
+from work_queue import WorkQueue, message_hash, process_claimed
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "queue.db")
+
+
+def attempts(queue, job_id):
+    return queue._db.execute("SELECT attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+
+
+def test_claim_and_ack(db_path):
+    queue = WorkQueue(db_path)
+    assert queue.enqueue([("a.txt", "first"), ("b.txt", "second"), ("copy.txt", "first\r\n")]) == 2
+    jobs = queue.claim("w1", limit=10)
+    assert [source for _, source, _ in jobs] == ["a.txt", "b.txt"]
+    assert queue.claim("w2") == []
+    queue.ack("w1", [(job_id, {"source": source}) for job_id, source, _ in jobs])
+    assert queue.status()["counts"]["done"] == 2
+    assert queue.remaining() == 0
+    assert list(queue.results()) == [("a.txt", {"source": "a.txt"}), ("b.txt", {"source": "b.txt"})]
+
+
+def test_jobs_keep_enqueue_order_within_a_chunk(db_path):
+    queue = WorkQueue(db_path)
+    sources = [f"a.mbox:{i}" for i in range(1, 13)]
+    queue.enqueue([(source, f"message {source}") for source in sources])
+    jobs = queue.claim("w1", limit=5)
+    assert [source for _, source, _ in jobs] == sources[:5]
+    jobs += queue.claim("w1", limit=20)
+    queue.ack("w1", [(job_id, {"source": source}) for job_id, source, _ in reversed(jobs)])
+    assert [source for source, _ in queue.results()] == sources
+
+
+def test_expired_lease_is_reclaimed(db_path):
+    queue = WorkQueue(db_path, lease_seconds=0.05)
+    queue.enqueue([("a.txt", "first")])
+    [(job_id, _, _)] = queue.claim("w1")
+    assert queue.claim("w2") == []
+    time.sleep(0.1)
+    assert [job[0] for job in queue.claim("w2")] == [job_id]
+    assert attempts(queue, job_id) == 2
+
+
+def test_renewed_lease_is_not_reclaimed(db_path):
+    queue = WorkQueue(db_path, lease_seconds=0.2)
+    queue.enqueue([("a.txt", "first")])
+    [(job_id, _, _)] = queue.claim("w1")
+    time.sleep(0.12)
+    queue.renew("w1", [job_id])
+    time.sleep(0.12)
+    assert queue.claim("w2") == []
+    # Only the lease owner can renew
+    queue.renew("w2", [job_id])
+    time.sleep(0.1)
+    assert [job[0] for job in queue.claim("w2")] == [job_id]
+
+
+def test_jobs_fail_after_max_attempts(db_path):
+    queue = WorkQueue(db_path, lease_seconds=0.05, max_attempts=2)
+    queue.enqueue([("a.txt", "first")])
+    job_id = message_hash("first")
+    queue.claim("w1")
+    queue.fail("w1", job_id, "ValueError: bad")
+    assert queue.status()["counts"]["pending"] == 1
+    queue.claim("w1")
+    time.sleep(0.1)
+    assert queue.claim("w2") == []
+    status = queue.status()
+    assert status["counts"]["failed"] == 1
+    assert status["failures"][0]["error"] == "lease expired"
+    assert queue.retry_failed() == 1
+    assert [job[0] for job in queue.claim("w2")] == [job_id]
+
+
+class SlowProcessor:
+    """Yields one result per email after `delay`, checking whether another worker can steal the batch"""
+
+    def __init__(self, delay, thief=None, broken=()):
+        self.delay = delay
+        self.thief = thief
+        self.broken = broken
+        self.stolen = []
+
+    def process_batch(self, texts, batch_size=64):
+        if any(text in self.broken for text in texts):
+            raise ValueError("batch failed")
+        for text in texts:
+            time.sleep(self.delay)
+            if self.thief is not None:
+                self.stolen += self.thief.claim("thief")
+            yield {"text": text}
+
+    def process_email(self, text):
+        if text in self.broken:
+            raise ValueError(f"cannot parse {text}")
+        return {"text": text}
+
+
+def test_long_batches_keep_their_lease(db_path):
+    queue = WorkQueue(db_path, lease_seconds=0.3)
+    queue.enqueue([(f"{i}.txt", f"email {i}") for i in range(8)])
+    jobs = queue.claim("w1", limit=8)
+    processor = SlowProcessor(0.08, thief=WorkQueue(db_path, lease_seconds=0.3))
+    process_claimed(queue, processor, "w1", jobs)
+    assert processor.stolen == []
+    assert queue.status()["counts"]["done"] == 8
+    assert all(attempts(queue, job_id) == 1 for job_id, _, _ in jobs)
+
+
+def test_bad_email_only_fails_itself(db_path):
+    queue = WorkQueue(db_path, max_attempts=1)
+    queue.enqueue([("good.txt", "good"), ("bad.txt", "bad")])
+    process_claimed(queue, SlowProcessor(0, broken={"bad"}), "w1", queue.claim("w1"))
+    status = queue.status()
+    assert status["counts"]["done"] == 1
+    assert status["failures"] == [{"source": "bad.txt", "attempts": 1, "error": "ValueError: cannot parse bad"}]
@@ -0,0 +1,335 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from extraction_cache import normalize_email
+
+STATUSES = ("pending", "leased", "done", "failed")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    body TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    error TEXT,
+    enqueued REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_claimable ON jobs (status, lease_expires);
+CREATE TABLE IF NOT EXISTS results (
+    id TEXT PRIMARY KEY,
+    result TEXT NOT NULL,
+    worker TEXT NOT NULL,
+    finished REAL NOT NULL
+);
+"""
+
+
+def message_hash(email_text: str) -> str:
+    return hashlib.sha256(normalize_email(email_text).encode()).hexdigest()
+
+
+class WorkQueue:
+    """Durable email job queue in one SQLite file, shared by any number of worker processes.
+
+    Workers claim jobs under a lease; if a worker dies its jobs become claimable again once
+    the lease expires. Jobs and results are keyed by message hash, so enqueueing an email
+    twice or acknowledging a job twice is harmless. WAL mode needs every process on the
+    same host, so point machines at their own queue file rather than a network share.
+    """
+
+    def __init__(self, path: str, lease_seconds: float = 300.0, max_attempts: int = 3):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # Autocommit mode, so transactions are opened explicitly with BEGIN IMMEDIATE
+        self._db = sqlite3.connect(path, timeout=30.0, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    @contextmanager
+    def _transaction(self):
+        # Take the write lock up front so two workers can never claim the same rows
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield self._db
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    def enqueue(self, emails: Iterable[Tuple[str, str]], chunk_size: int = 500) -> int:
+        """Add (source, text) pairs; emails already queued under the same hash are skipped"""
+        added = 0
+        chunk = []
+        for source, email_text in emails:
+            chunk.append((message_hash(email_text), source, email_text))
+            if len(chunk) >= chunk_size:
+                added += self._insert(chunk)
+                chunk = []
+        if chunk:
+            added += self._insert(chunk)
+        return added
+
+    def _insert(self, rows: List[Tuple[str, str, str]]) -> int:
+        now = time.time()
+        with self._transaction() as db:
+            before = db.total_changes
+            db.executemany(
+                "INSERT OR IGNORE INTO jobs (id, source, body, enqueued, updated) VALUES (?, ?, ?, ?, ?)",
+                [(job_id, source, body, now, now) for job_id, source, body in rows]
+            )
+            return db.total_changes - before
+
+    def claim(self, worker: str, limit: int = 64) -> List[Tuple[str, str, str]]:
+        """Lease up to `limit` pending or abandoned jobs as (id, source, text)"""
+        now = time.time()
+        with self._transaction() as db:
+            # A job whose lease ran out on its last attempt has crashed its worker too often
+            db.execute(
+                "UPDATE jobs SET status = 'failed', error = 'lease expired', lease_owner = NULL, updated = ? "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, now, self.max_attempts)
+            )
+            rows = db.execute(
+                "SELECT id, source, body FROM jobs "
+                "WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?) "
+                "ORDER BY rowid LIMIT ?",
+                (now, limit)
+            ).fetchall()
+            db.executemany(
+                "UPDATE jobs SET status = 'leased', attempts = attempts + 1, lease_owner = ?, "
+                "lease_expires = ?, updated = ? WHERE id = ?",
+                [(worker, now + self.lease_seconds, now, job_id) for job_id, _, _ in rows]
+            )
+        return rows
+
+    def renew(self, worker: str, job_ids: Iterable[str]):
+        """Extend the lease on jobs this worker still holds"""
+        now = time.time()
+        with self._transaction() as db:
+            db.executemany(
+                "UPDATE jobs SET lease_expires = ?, updated = ? "
+                "WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+                [(now + self.lease_seconds, now, job_id, worker) for job_id in job_ids]
+            )
+
+    def ack(self, worker: str, results: Iterable[Tuple[str, Dict]]):
+        """Store (id, result) pairs and mark their jobs done in one transaction.
+
+        The first stored result for a message wins, so a late duplicate ack from a worker
+        whose lease had expired changes nothing.
+        """
+        now = time.time()
+        rows = [(job_id, json.dumps(result)) for job_id, result in results]
+        with self._transaction() as db:
+            db.executemany(
+                "INSERT OR IGNORE INTO results (id, result, worker, finished) VALUES (?, ?, ?, ?)",
+                [(job_id, payload, worker, now) for job_id, payload in rows]
+            )
+            db.executemany(
+                "UPDATE jobs SET status = 'done', lease_owner = NULL, error = NULL, updated = ? WHERE id = ?",
+                [(now, job_id) for job_id, _ in rows]
+            )
+
+    def fail(self, worker: str, job_id: str, error: str):
+        """Release a job after an error; it is retried until it has used max_attempts"""
+        now = time.time()
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "lease_owner = NULL, error = ?, updated = ? WHERE id = ? AND lease_owner = ?",
+                (self.max_attempts, error, now, job_id, worker)
+            )
+
+    def retry_failed(self) -> int:
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET status = 'pending', attempts = 0, updated = ? WHERE status = 'failed'",
+                (time.time(),)
+            )
+            return cursor.rowcount
+
+    def remaining(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('pending', 'leased')").fetchone()[0]
+
+    def status(self, failure_limit: int = 10) -> Dict:
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update(self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        retried = self._db.execute("SELECT COUNT(*) FROM jobs WHERE attempts > 1").fetchone()[0]
+        workers = self._db.execute(
+            "SELECT lease_owner, COUNT(*) FROM jobs WHERE status = 'leased' GROUP BY lease_owner"
+        ).fetchall()
+        failures = self._db.execute(
+            "SELECT source, attempts, error FROM jobs WHERE status = 'failed' ORDER BY updated DESC LIMIT ?",
+            (failure_limit,)
+        ).fetchall()
+        return {
+            "counts": counts,
+            "total": sum(counts.values()),
+            "retried": retried,
+            "workers": dict(workers),
+            "failures": [{"source": source, "attempts": attempts, "error": error}
+                         for source, attempts, error in failures],
+        }
+
+    def results(self) -> Iterator[Tuple[str, Dict]]:
+        """Yield (source, order) for every finished job, in enqueue order"""
+        cursor = self._db.execute(
+            "SELECT jobs.source, results.result FROM jobs JOIN results ON results.id = jobs.id "
+            "ORDER BY jobs.rowid"
+        )
+        for source, payload in cursor:
+            yield source, json.loads(payload)
+
+    def close(self):
+        self._db.close()
+
+
+def process_claimed(queue: WorkQueue, processor, worker: str, jobs: List[Tuple[str, str, str]],
+                    batch_size: int = 64):
+    """Extract and acknowledge one claimed batch, renewing the lease on the rest as it goes.
+
+    The lease is renewed between emails once a third of it has passed, so a batch that runs
+    longer than --lease is not reclaimed and processed twice by another worker.
+    """
+    job_ids = [job_id for job_id, _, _ in jobs]
+    renewed = time.monotonic()
+
+    def keep_lease():
+        # Results are acknowledged together, so every claimed job stays leased until then
+        nonlocal renewed
+        if time.monotonic() - renewed > queue.lease_seconds / 3:
+            queue.renew(worker, job_ids)
+            renewed = time.monotonic()
+
+    results = []
+    try:
+        for result in processor.process_batch([body for _, _, body in jobs], batch_size=batch_size):
+            results.append(result)
+            keep_lease()
+    except Exception:
+        # Retry one at a time so a single bad email does not fail the whole batch
+        results = None
+    if results is not None:
+        queue.ack(worker, list(zip(job_ids, results)))
+        return
+    for job_id, _, body in jobs:
+        keep_lease()
+        try:
+            result = processor.process_email(body)
+        except Exception as e:
+            queue.fail(worker, job_id, f"{type(e).__name__}: {e}")
+        else:
+            queue.ack(worker, [(job_id, result)])
+
+
+def run_worker(db_path: str, mode: str = "full", snapshot: Optional[str] = None,
+               batch_size: int = 64, poll_interval: float = 2.0, follow: bool = False,
+               lease_seconds: float = 300.0, max_attempts: int = 3):
+    """Claim, extract and acknowledge jobs until the queue is drained (or forever with follow)"""
+    from order_processor import OrderProcessor
+    queue = WorkQueue(db_path, lease_seconds, max_attempts)
+    processor = OrderProcessor.from_snapshot(snapshot) if snapshot else OrderProcessor(mode=mode)
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    while True:
+        if not (jobs := queue.claim(worker, batch_size)):
+            if not follow and queue.remaining() == 0:
+                break
+            time.sleep(poll_interval)
+            continue
+        process_claimed(queue, processor, worker, jobs, batch_size)
+    queue.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Durable, resumable email extraction queue")
+    parser.add_argument("--db", default="work_queue.db", help="SQLite queue file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue = commands.add_parser("enqueue", help="Queue every email under a path")
+    enqueue.add_argument("input", help="Directory, Maildir, mbox, .eml or .txt file")
+
+    worker = commands.add_parser("worker", help="Process queued emails")
+    worker.add_argument("--processes", type=int, default=1, help="Worker processes, one OrderProcessor each")
+    worker.add_argument("--batch-size", type=int, default=64, help="Jobs claimed and piped per batch")
+    worker.add_argument("--mode", choices=["full", "tiered"], default="full")
+    worker.add_argument("--snapshot", help="Processor snapshot directory, created first if missing")
+    worker.add_argument("--lease", type=float, default=300.0, help="Seconds before an unfinished job is reclaimed")
+    worker.add_argument("--max-attempts", type=int, default=3, help="Attempts before a job is marked failed")
+    worker.add_argument("--follow", action="store_true", help="Keep polling for new jobs instead of exiting")
+
+    commands.add_parser("status", help="Show progress, retries and recent failures")
+    commands.add_parser("retry-failed", help="Requeue every failed job")
+
+    export = commands.add_parser("export", help="Write finished results as JSON lines")
+    export.add_argument("--out", default="results.jsonl")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    from rich.console import Console
+    console = Console()
+
+    if args.command == "worker":
+        if args.snapshot and not (Path(args.snapshot) / "settings.json").exists():
+            from order_processor import OrderProcessor
+            OrderProcessor(mode=args.mode).save_snapshot(args.snapshot)
+        options = (args.db, args.mode, args.snapshot, args.batch_size, 2.0, args.follow, args.lease, args.max_attempts)
+        workers = [multiprocessing.Process(target=run_worker, args=options) for _ in range(args.processes)]
+        for process in workers:
+            process.start()
+        for process in workers:
+            process.join()
+        failed = sum(1 for process in workers if process.exitcode)
+        console.print(f"{args.processes - failed} of {args.processes} workers finished cleanly")
+
+    queue = WorkQueue(args.db)
+    if args.command == "enqueue":
+        from ingest import iter_emails
+        added = queue.enqueue(iter_emails(args.input))
+        console.print(f"Queued {added} new emails")
+    elif args.command == "retry-failed":
+        console.print(f"Requeued {queue.retry_failed()} failed jobs")
+    elif args.command == "export":
+        written = 0
+        with open(args.out, 'w') as f:
+            for source, order_data in queue.results():
+                f.write(json.dumps({"source": source, "order": order_data}) + "\n")
+                written += 1
+        console.print(f"Wrote {written} results to {args.out}")
+
+    if args.command in ("status", "worker"):
+        from rich.table import Table
+        status = queue.status()
+        table = Table(title=f"Queue {args.db}", show_header=True, header_style="bold magenta")
+        table.add_column("Status")
+        table.add_column("Jobs")
+        for name, count in status['counts'].items():
+            table.add_row(name, str(count))
+        table.add_row("retried", str(status['retried']))
+        console.print(table)
+        done = status['counts']['done']
+        console.print(f"Progress: {done}/{status['total']} ({done / status['total'] if status['total'] else 0:.0%})")
+        for owner, count in status['workers'].items():
+            console.print(f"Worker {owner} holds {count} jobs")
+        for failure in status['failures']:
+            console.print(f"❌ {failure['source']} after {failure['attempts']} attempts: {failure['error']}", style="red")
+    queue.close()
+
+
+if __name__ == "__main__":
+    main()